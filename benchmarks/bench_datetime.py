@@ -0,0 +1,126 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+Compare the date and time decoders against the original implementations
+based on strptime and a regular expression.
+
+    $ python benchmarks/bench_datetime.py
+'''
+
+import datetime
+import re
+import timeit
+
+import adsdb3
+
+
+_TIME_RE = re.compile(
+    r'^'
+    r'(?P<hour>\d{2})'
+    r':'
+    r'(?P<minute>\d{2})'
+    r':'
+    r'(?P<second>\d{2})'
+    r'(?P<microsecond>\.\d+)?'
+    r'(?: (?P<ampm>AM|PM))?'
+    r'$'
+)
+
+
+def old_date(s):
+    if not s:
+        return None
+    return datetime.datetime.strptime(s, '%m/%d/%Y').date()
+
+
+def old_time(s):
+    if not s:
+        return None
+    matchobj = _TIME_RE.match(s)
+    if matchobj:
+        hour = int(matchobj.group('hour'))
+        if hour == 12:
+            hour = 0
+        if matchobj.group('ampm') == 'PM':
+            hour += 12
+        if matchobj.group('microsecond'):
+            microsecond = int(float(matchobj.group('microsecond')) * 1000000)
+        else:
+            microsecond = 0
+        return datetime.time(
+            hour,
+            int(matchobj.group('minute')),
+            int(matchobj.group('second')),
+            microsecond
+        )
+    else:
+        raise adsdb3.OperationalError('Invalid time value %s' % (s, ))
+
+
+def old_datetime(s):
+    if not s:
+        return None
+    if ' ' in s:
+        sd, st = s.split(' ', 1)
+        d = old_date(sd)
+        t = old_time(st)
+        return datetime.datetime(
+            d.year,
+            d.month,
+            d.day,
+            t.hour,
+            t.minute,
+            t.second,
+            t.microsecond
+        )
+    else:
+        return old_date(s)
+
+
+def _dates(n, distinct):
+    start = datetime.date(2015, 1, 1)
+    return [
+        format(start + datetime.timedelta(days=i % distinct), '%m/%d/%Y')
+        for i in range(n)
+    ]
+
+
+CASES = [
+    ('date, 365 distinct values', old_date, adsdb3._date,
+     _dates(10000, 365)),
+    ('date, all distinct values', old_date, adsdb3._date.__wrapped__,
+     _dates(10000, 10000)),
+    ('time', old_time, adsdb3._time,
+     ['%02d:%02d:%02d' % (i % 24, i % 60, i % 59) for i in range(10000)]),
+    ('time AM/PM', old_time, adsdb3._time,
+     ['%02d:%02d:%02d.%03d PM' % (i % 12 + 1, i % 60, i % 59, i % 1000)
+      for i in range(10000)]),
+    ('timestamp', old_datetime, adsdb3._datetime,
+     ['%s %02d:%02d:%02d.%03d' % (d, i % 24, i % 60, i % 59, i % 1000)
+      for i, d in enumerate(_dates(10000, 365))]),
+]
+
+
+def bench(func, values, repeat=5):
+    def run():
+        for value in values:
+            func(value)
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(values)
+
+
+def main():
+    print('{:<28} {:>12} {:>12} {:>8}'.format(
+        'case', 'old (us)', 'new (us)', 'speedup'
+    ))
+    for name, old, new, values in CASES:
+        for value in values[:100]:
+            assert old(value) == new(value), value
+        told = bench(old, values) * 1e6
+        tnew = bench(new, values) * 1e6
+        print('{:<28} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+            name, told, tnew, told / tnew
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+Benchmarks of the hot paths of the driver.
+
+They run against the stand-in ACE library in test/fakeace, that serves
+synthetic result sets, no server is needed: the shape of a result set is
+given in a /*fake ...*/ comment in the SQL. Build _ace against it before
+running them:
+
+    $ make -C test/fakeace
+    $ ADSDB3_ACE_LIBRARY_DIR=test/fakeace pip install -e .
+
+    $ python benchmarks/bench_driver.py --save      # before the changes
+    $ python benchmarks/bench_driver.py             # after the changes
+    $ python benchmarks/bench_driver.py -k fetch    # only some cases
+
+Every case reports the time of one operation in microseconds, the best
+of a few runs. A case regresses when it is slower than the baseline by
+more than the threshold, 25% by default, even after measuring it again
+twice; then the exit status is 1. It is 2 when there is no baseline to
+compare with. The timings depend on the machine, so the baseline is not
+in the repository: pin it on the machine that runs the comparison,
+before the changes to measure.
+'''
+
+import argparse
+import datetime
+import decimal
+import json
+import os.path
+import platform
+import sys
+import timeit
+
+import adsdb3
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+CONNECTION_STRING = 'DataSource=bench'
+THRESHOLD = 0.25
+RETRIES = 2
+
+NARROW = 'integer,varchar(20)'
+WIDE = ','.join(
+    ['integer', 'double', 'varchar(20)', 'date', 'numeric(10,2)',
+     'timestamp', 'nvarchar(10)', 'bigint', 'char(4)', 'raw(8)'] * 5
+)
+
+
+def _select(rows, columns, nulls=0.0):
+    return 'SELECT /*fake rows={} nulls={} columns={}*/ * FROM bench'.format(
+        rows, nulls, columns
+    )
+
+
+class Resources:
+    '''
+    Open the connections and the cursors of a case, close them when the
+    case is done.
+    '''
+
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+        self.resources = []
+
+    def connect(self, **kwds):
+        connection = adsdb3.connect(self.connection_string, **kwds)
+        self.resources.append(connection)
+        return connection
+
+    def cursor(self, connection=None):
+        if connection is None:
+            connection = self.connect()
+        cursor = connection.cursor()
+        self.resources.append(cursor)
+        return cursor
+
+    def close(self):
+        while self.resources:
+            self.resources.pop().close()
+
+
+def bench_connect(resources):
+    def run():
+        for i in range(100):
+            resources.connect().close()
+    return run, 100
+
+
+def _bench_execute(resources, cache_size):
+    connection = resources.connect()
+    connection.statement_cache_size = cache_size
+    cursor = resources.cursor(connection)
+    operation = 'SELECT /*fake rows=1*/ * FROM bench WHERE id = ?'
+
+    def run():
+        for i in range(1000):
+            cursor.execute(operation, (1, ))
+            cursor.fetchall()
+    return run, 1000
+
+
+def bench_prepare(resources):
+    return _bench_execute(resources, 0)
+
+
+def bench_cached_execute(resources):
+    return _bench_execute(resources, adsdb3._STATEMENT_CACHE_SIZE)
+
+
+BIND_VALUES = [
+    ('int', 123456),
+    ('bigint', 2 ** 40),
+    ('float', 3.25),
+    ('str', 'Ça peut pas faire de mal'),
+    ('bytes', b'\x00\x01\x02\x03' * 8),
+    ('decimal', decimal.Decimal('12345.6789')),
+    ('date', datetime.date(2018, 5, 14)),
+    ('time', datetime.time(12, 30, 15)),
+    ('datetime', datetime.datetime(2018, 5, 14, 12, 30, 15, 123000)),
+    ('null', None),
+]
+
+
+def _bench_bind(value):
+    def bench(resources):
+        cursor = resources.cursor()
+        rows = [(value, )] * 1000
+
+        def run():
+            cursor.executemany('INSERT INTO bench VALUES (?)', rows)
+        return run, len(rows)
+    return bench
+
+
+def _bench_fetch(rows, columns):
+    def bench(resources):
+        cursor = resources.cursor()
+        operation = _select(rows, columns, 0.1)
+
+        def run():
+            cursor.execute(operation)
+            cursor.fetchall()
+        return run, rows
+    return bench
+
+
+DECODE_COLUMNS = [
+    ('val32', 'integer'),
+    ('val64', 'bigint'),
+    ('double', 'double'),
+    ('string', 'varchar(20)'),
+    ('nchar', 'nvarchar(10)'),
+    ('binary', 'raw(8)'),
+    ('decimal', 'numeric(10,2)'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('timestamp', 'timestamp'),
+]
+
+
+def _bench_decode(column):
+    def bench(resources):
+        # Fetch a batch once and time only the decoding of its values,
+        # the path of fetchall and fetchmany
+        cursor = resources.cursor()
+        cursor.execute(_select(adsdb3._BATCH_SIZE, column, 0.1))
+        batch = cursor._stmt.fetch_batch(adsdb3._BATCH_SIZE)
+
+        def run():
+            for i in range(10):
+                batch.values(0)
+        return run, batch.rows * 10
+    return bench
+
+
+def bench_executemany(resources):
+    cursor = resources.cursor()
+    rows = [
+        (i, 'name {}'.format(i), i * 1.5, datetime.date(2018, 1, 1),
+         decimal.Decimal(i) / 100)
+        for i in range(1000)
+    ]
+
+    def run():
+        cursor.executemany('INSERT INTO bench VALUES (?, ?, ?, ?, ?)', rows)
+    return run, len(rows)
+
+
+CASES = (
+    [
+        ('connect', bench_connect),
+        ('execute/prepare', bench_prepare),
+        ('execute/cached', bench_cached_execute),
+    ] +
+    [('bind/' + name, _bench_bind(value)) for name, value in BIND_VALUES] +
+    [
+        ('fetch/narrow', _bench_fetch(100000, NARROW)),
+        ('fetch/wide', _bench_fetch(5000, WIDE)),
+    ] +
+    [
+        ('decode/' + name, _bench_decode(column))
+        for name, column in DECODE_COLUMNS
+    ] +
+    [
+        ('executemany', bench_executemany),
+    ]
+)
+
+
+def measure(bench, connection_string, repeat):
+    '''
+    Return the best time of one operation of bench in microseconds.
+    '''
+
+    resources = Resources(connection_string)
+    try:
+        run, operations = bench(resources)
+        run()  # warm up the caches
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+    finally:
+        resources.close()
+    return best / operations * 1e6
+
+
+def load_baseline(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    baseline = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+    with open(path, 'w') as fp:
+        json.dump(baseline, fp, indent=4, sort_keys=True)
+        fp.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='run only the cases whose name contains it')
+    parser.add_argument('--connection-string', default=CONNECTION_STRING)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown, 0.25 is 25%%')
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None and not args.save:
+        print('no baseline in {}, pin one with --save'.format(args.baseline),
+              file=sys.stderr)
+        return 2
+    pinned = {} if baseline is None else baseline['results']
+    results = {}
+    regressions = []
+    print('{:<20} {:>12} {:>12} {:>8}'.format(
+        'case', 'us/op', 'baseline', 'change'
+    ))
+    for name, bench in CASES:
+        if args.pattern not in name:
+            continue
+        elapsed = measure(bench, args.connection_string, args.repeat)
+        if name in pinned and not args.save:
+            # A noisy neighbour can slow down a single run, measure a
+            # slow case again before calling it a regression
+            for i in range(RETRIES):
+                if elapsed <= pinned[name] * (1 + args.threshold):
+                    break
+                elapsed = min(elapsed, measure(bench, args.connection_string,
+                                               args.repeat))
+        results[name] = elapsed
+        if name in pinned:
+            change = elapsed / pinned[name] - 1
+            regressed = change > args.threshold
+            if regressed:
+                regressions.append(name)
+            print('{:<20} {:>12.3f} {:>12.3f} {:>+7.1%}{}'.format(
+                name, elapsed, pinned[name], change,
+                ' REGRESSION' if regressed else ''
+            ))
+        else:
+            print('{:<20} {:>12.3f} {:>12} {:>8}'.format(
+                name, elapsed, '-', '-'
+            ))
+    if args.save:
+        pinned.update(results)
+        save_baseline(args.baseline, pinned)
+        print('baseline saved to {}'.format(args.baseline))
+        return 0
+    if regressions:
+        print('{} regression(s) over {:.0%}: {}'.format(
+            len(regressions), args.threshold, ', '.join(regressions)
+        ))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
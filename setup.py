@@ -8,7 +8,7 @@ with open('README') as fd:
     long_description = fd.read()
 
 
-with open(os.path.join('src', 'adsdb3.py')) as fp:
+with open(os.path.join('src', 'adsdb3', '__init__.py')) as fp:
     glb = {}
     for line in fp:
         if '__version__' in line:
@@ -28,11 +28,13 @@ setup(
     url='https://github.com/marcogiusti/adsdb3',
     license='MIT',
     package_dir={'': 'src'},
-    py_modules=['adsdb3'],
+    packages=['adsdb3'],
     setup_requires=['cffi>=1.0.0'],
     cffi_modules=['src/ace_build.py:ffibuilder'],
     install_requires=['cffi>=1.0.0'],
     extras_require={
+        'numpy': ['numpy'],
+        'arrow': ['pyarrow'],
         'dev': [
             'coverage',
             'hypothesis',
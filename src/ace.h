@@ -82,6 +82,12 @@ enum a_ads_native_type {
     DT_LONGNVARCHAR = 640
 };
 
+struct a_ads_data_info {
+    enum a_ads_data_type type;
+    unsigned int is_null;
+    unsigned int data_size;
+};
+
 struct a_ads_column_info {
     char *name;
     enum a_ads_data_type type;
@@ -121,6 +127,10 @@ int ads_get_column(struct a_ads_stmt *ads_stmt, unsigned int col_index,
 		struct a_ads_data_value *buffer);
 int ads_get_column_info(struct a_ads_stmt *ads_stmt, unsigned int col_index,
 		struct a_ads_column_info *buffer);
+int ads_get_data(struct a_ads_stmt *ads_stmt, unsigned int col_index,
+		size_t offset, void *buffer, size_t size);
+int ads_get_data_info(struct a_ads_stmt *ads_stmt, unsigned int col_index,
+		struct a_ads_data_info *buffer);
 
 /* Advantage Client Engine Transaction Processing APIs */
 unsigned int AdsBeginTransaction(uint64_t handle);
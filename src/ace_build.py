@@ -6,18 +6,138 @@ from cffi import FFI
 
 curdir = os.path.abspath(os.path.dirname(__file__))
 
+# Helpers compiled into _ace. adsdb3_fetch_batch fetches up to max_rows
+# rows and copies the values in the caller buffers with a single call,
+# instead of crossing the FFI boundary for every value.
+#
+# For every column the caller provides the index of the column in the
+# result set, the null flags and, for the fixed width types, a buffer of
+# max_rows * width bytes. The values of the variable length types are
+# appended to the arena, their offsets and lengths are stored in the
+# column. The NULL fixed width values are zeroed. The arena is allocated
+# and grown by the helper, release it with adsdb3_arena_free.
+#
+# Return the number of rows fetched, -1 if ads_get_column failed or -2
+# if the arena could not grow.
+helpers_h = r'''
+struct adsdb3_column {
+    unsigned int index;
+    unsigned int width;
+    char *data;
+    unsigned char *nulls;
+    size_t *offsets;
+    unsigned int *lengths;
+};
+
+struct adsdb3_arena {
+    char *data;
+    size_t size;
+    size_t used;
+};
+
+int adsdb3_fetch_batch(struct a_ads_stmt *stmt,
+		struct adsdb3_column *columns, unsigned int num_cols,
+		unsigned int max_rows, struct adsdb3_arena *arena);
+void adsdb3_arena_free(struct adsdb3_arena *arena);
+'''
+
+helpers_c = r'''
+#include <stdlib.h>
+#include <string.h>
+
+static int adsdb3_arena_reserve(struct adsdb3_arena *arena, size_t length)
+{
+    size_t size;
+    char *data;
+
+    if (arena->used + length <= arena->size)
+        return 1;
+    size = arena->size ? arena->size * 2 : 4096;
+    while (size < arena->used + length)
+        size *= 2;
+    data = realloc(arena->data, size);
+    if (data == NULL)
+        return 0;
+    arena->data = data;
+    arena->size = size;
+    return 1;
+}
+
+int adsdb3_fetch_batch(struct a_ads_stmt *stmt,
+		struct adsdb3_column *columns, unsigned int num_cols,
+		unsigned int max_rows, struct adsdb3_arena *arena)
+{
+    struct a_ads_data_value value;
+    unsigned int row, i;
+
+    arena->used = 0;
+    for (row = 0; row < max_rows; row++) {
+        if (!ads_fetch_next(stmt))
+            break;
+        for (i = 0; i < num_cols; i++) {
+            struct adsdb3_column *column = &columns[i];
+            size_t width = column->width;
+
+            if (!ads_get_column(stmt, column->index, &value))
+                return -1;
+            if (value.is_null != NULL && *value.is_null) {
+                column->nulls[row] = 1;
+                if (width) {
+                    memset(column->data + row * width, 0, width);
+                } else {
+                    column->offsets[row] = arena->used;
+                    column->lengths[row] = 0;
+                }
+                continue;
+            }
+            column->nulls[row] = 0;
+            if (width) {
+                memcpy(column->data + row * width, value.buffer, width);
+            } else {
+                size_t length = *value.length;
+
+                if (!adsdb3_arena_reserve(arena, length))
+                    return -2;
+                memcpy(arena->data + arena->used, value.buffer, length);
+                column->offsets[row] = arena->used;
+                column->lengths[row] = (unsigned int)length;
+                arena->used += length;
+            }
+        }
+    }
+    return (int)row;
+}
+
+void adsdb3_arena_free(struct adsdb3_arena *arena)
+{
+    free(arena->data);
+    arena->data = NULL;
+    arena->size = arena->used = 0;
+}
+'''
+
 c_source = r'''
 #include "ace.h"
-'''
+''' + helpers_h + helpers_c
+
+# Link against the libace in another directory, e.g. the stand-in
+# library in test/fakeace
+library_dirs = []
+library_dir = os.environ.get('ADSDB3_ACE_LIBRARY_DIR')
+if library_dir:
+    library_dirs.append(os.path.abspath(library_dir))
 
 ffibuilder = FFI()
 ffibuilder.set_source(
     '_ace',
     c_source,
     libraries=['ace'],
-    include_dirs=[curdir]
+    include_dirs=[curdir],
+    library_dirs=library_dirs,
+    runtime_library_dirs=library_dirs
 )
 ffibuilder.cdef(open(os.path.join('src', 'ace.h')).read())
+ffibuilder.cdef(helpers_h)
 
 
 if __name__ == '__main__':
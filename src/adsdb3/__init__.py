@@ -0,0 +1,2355 @@
+# Copyright (c) 2018 Marco Giusti
+
+import array
+import base64
+import collections
+import concurrent.futures
+import csv
+import datetime
+import decimal
+import functools
+import io
+import itertools
+import json
+import math
+import re
+import struct
+import threading
+import time
+import warnings
+import weakref
+from _ace import ffi, lib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
+
+
+__version__ = '0.2.0'
+__all__ = [
+    'apilevel', 'threadsafety', 'paramstyle', 'connect', 'Warning', 'Error',
+    'InterfaceError', 'DatabaseError', 'DataError', 'OperationalError',
+    'IntegrityError', 'InternalError', 'ProgrammingError', 'NotSupportedError',
+    'Date', 'Time', 'Timestamp', 'DateFromTicks', 'TimeFromTicks',
+    'TimestampFromTicks', 'Binary', 'STRING', 'BINARY', 'NUMBER', 'DATETIME',
+    'ROWID', 'Row', 'LongValue', 'gather', 'BulkInsertStats'
+]
+
+
+API_VERSION = 1
+apilevel = '2.0'
+threadsafety = 2
+paramstyle = 'qmark'
+
+StatementCacheInfo = collections.namedtuple(
+    'StatementCacheInfo',
+    'hits misses maxsize currsize'
+)
+QueryResult = collections.namedtuple(
+    'QueryResult',
+    'rows description rowcount error elapsed'
+)
+BulkInsertStats = collections.namedtuple(
+    'BulkInsertStats',
+    'rows commits elapsed rate'
+)
+
+_FORMATS = 'xxxdqQiIhHbBxxxxx'
+_MIN_INT32 = -(2 ** 31)
+_MAX_INT32 = 2 ** 31 - 1
+_MIN_INT64 = -(2 ** 63)
+_MAX_INT64 = 2 ** 63 - 1
+_NATIVE_ERROR_RE = re.compile(r'NativeError\s+=\s+(?P<errno>\d+);')
+_STATEMENT_CACHE_SIZE = 32
+_GATHER_WORKERS = 8
+_BULK_BATCH_SIZE = 1000
+# A name, a #temporary table or a [bracketed name], qualified with dots
+_IDENTIFIER = re.compile(
+    r'(?:#?\w+|\[[^\[\]]+\])(?:\.(?:\w+|\[[^\[\]]+\]))*\Z'
+)
+_DATE_CACHE_SIZE = 4096
+_STRUCTS = dict(
+    (type, struct.Struct(fmt)) for type, fmt in enumerate(_FORMATS)
+    if fmt != 'x'
+)
+_CTYPES = {
+    lib.A_DOUBLE: ffi.typeof('double *'),
+    lib.A_VAL64: ffi.typeof('int64_t *'),
+    lib.A_UVAL64: ffi.typeof('uint64_t *'),
+    lib.A_VAL32: ffi.typeof('int32_t *'),
+    lib.A_UVAL32: ffi.typeof('uint32_t *'),
+    lib.A_VAL16: ffi.typeof('int16_t *'),
+    lib.A_UVAL16: ffi.typeof('uint16_t *'),
+    lib.A_VAL8: ffi.typeof('int8_t *'),
+    lib.A_UVAL8: ffi.typeof('uint8_t *'),
+}
+_MIN_BIND_BUFFER = 64
+_LONG_TYPES = frozenset([
+    lib.DT_LONGBINARY,
+    lib.DT_LONGVARCHAR,
+    lib.DT_LONGNVARCHAR
+])
+_NUMPY_CAPACITY = 1024
+_BATCH_SIZE = 1024
+_INTERN_SIZE = 4096
+_INTERN_SAMPLE = 4096
+_INTERN_MIN_HIT_RATE = 0.5
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+if pyarrow is not None:
+    _ARROW_TYPES = {
+        lib.A_DOUBLE: pyarrow.float64(),
+        lib.A_VAL64: pyarrow.int64(),
+        lib.A_UVAL64: pyarrow.uint64(),
+        lib.A_VAL32: pyarrow.int32(),
+        lib.A_UVAL32: pyarrow.uint32(),
+        lib.A_VAL16: pyarrow.int16(),
+        lib.A_UVAL16: pyarrow.uint16(),
+        lib.A_VAL8: pyarrow.int8(),
+        lib.A_UVAL8: pyarrow.uint8(),
+    }
+
+
+ver = ffi.new('unsigned int[1]', [API_VERSION])
+if not lib.ads_init(b'adsdb3', API_VERSION, ver):
+    raise ImportError('Error initializing libace')
+if ver[0] != API_VERSION:
+    lib.ads_fini()
+    raise ImportError(
+        'Incompatible libace version %s. Required %s' % (ver[0], API_VERSION)
+    )
+del ver
+
+
+class DBAPITypeObject:
+
+    def __init__(self, *values):
+        self.values = frozenset(values)
+
+    def __eq__(self, other):
+        if other in self.values:
+            return True
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+STRING = DBAPITypeObject(
+    lib.DT_VARCHAR,
+    lib.DT_FIXCHAR,
+    lib.DT_LONGVARCHAR,
+    lib.DT_STRING,
+    lib.DT_NSTRING,
+    lib.DT_NFIXCHAR,
+    lib.DT_NVARCHAR,
+    lib.DT_LONGNVARCHAR
+)
+BINARY = DBAPITypeObject(
+    lib.DT_BINARY,
+    lib.DT_LONGBINARY
+)
+NUMBER = DBAPITypeObject(
+    lib.DT_DOUBLE,
+    lib.DT_FLOAT,
+    lib.DT_DECIMAL,
+    lib.DT_INT,
+    lib.DT_SMALLINT,
+    lib.DT_TINYINT,
+    lib.DT_BIGINT,
+    lib.DT_UNSINT,
+    lib.DT_UNSSMALLINT,
+    lib.DT_UNSBIGINT,
+    lib.DT_BIT
+)
+DATETIME = DBAPITypeObject(
+    lib.DT_DATE,
+    lib.DT_TIME,
+    lib.DT_TIMESTAMP
+)
+ROWID = DBAPITypeObject()
+_UNICODE_FIELD = (
+    lib.DT_NSTRING,
+    lib.DT_NFIXCHAR,
+    lib.DT_NVARCHAR,
+    lib.DT_LONGNVARCHAR
+)
+
+
+class Warning(Exception):
+    pass
+
+
+class Error(Exception):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class DatabaseError(Error):
+
+    def __init__(self, msg, errno=-1):
+        super().__init__(errno, msg)
+        self.msg = msg
+        self.errno = errno
+
+
+class DataError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class InternalError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class NotSupportedError(DatabaseError):
+    pass
+
+
+def _error(handler):
+    buflength = lib.ADS_MAX_ERROR_LEN
+    buf = ffi.new('char[]', buflength + 1)
+    errno = lib.ads_error(handler, buf, buflength)
+    if errno == 0:
+        return 'internal error: success', 0
+    msg = ffi.string(buf, buflength + 1).decode('ascii', 'ignore').rstrip()
+    if errno == 7200:
+        # because 7200 seems to be a generic error we look for a more specific
+        # error code and we report that instead
+        matchobj = _NATIVE_ERROR_RE.search(msg)
+        if matchobj is not None:
+            errno = int(matchobj.group('errno') or 0)
+    return msg, errno
+
+
+def _to_python(value, encoding):
+    '''
+    Convert a single value with the decoder of its type.
+    '''
+
+    if value.is_null[0]:
+        return None
+    return _decoder(value.type, encoding)(value)
+
+
+# There are few types and encodings, the decoders are shared by all the
+# result sets
+@functools.lru_cache(maxsize=None)
+def _decoder(type, encoding):
+    '''
+    Return a function that converts a not null value of the given type.
+
+    The result sets build a list of decoders, one for every column, when
+    they are described so the conversion of a row does not need to look
+    at the type of every value.
+    '''
+
+    if type in _CTYPES:
+        ctype = _CTYPES[type]
+
+        def decode(value, cast=ffi.cast):
+            return cast(ctype, value.buffer)[0]
+
+        return decode
+    try:
+        convert = _converter(type, encoding)
+    except OperationalError as exc:
+        return _invalid_decoder(exc)
+    if convert is None:
+
+        def decode(value, unpack=ffi.unpack):
+            return unpack(value.buffer, value.length[0])
+
+    else:
+
+        def decode(value, unpack=ffi.unpack):
+            return convert(unpack(value.buffer, value.length[0]))
+
+    return decode
+
+
+def _converter(type, encoding):
+    '''
+    Return a function that converts the bytes of a not null value of a
+    variable length type, or None if the bytes are the value itself.
+    '''
+
+    if type == lib.A_INVALID_TYPE:
+        # XXX: Don't know what to do
+        raise OperationalError('Invalid type')
+    if not 0 <= type < len(_FORMATS):
+        raise OperationalError('Unknown data type %s' % (type, ))
+    if type == lib.A_BINARY:
+        return None
+    elif type == lib.A_STRING:
+        # XXX: I need more infos how to handle encoding
+        return functools.partial(bytes.decode, encoding=encoding)
+    elif type == lib.A_NCHAR:
+        return functools.partial(bytes.decode, encoding='utf-16')
+    try:
+        convert = _TEXT_CONVERTERS[type]
+    except KeyError:
+        raise OperationalError('Invalid type {0}'.format(type))
+
+    def convert_text(data):
+        return convert(data.decode('ascii'))
+
+    return convert_text
+
+
+def _batch_converter(type, encoding):
+    if type in _CTYPES:
+        return None
+    try:
+        return _converter(type, encoding)
+    except OperationalError as exc:
+        return _invalid_decoder(exc)
+
+
+def _invalid_decoder(exc):
+
+    def decode(value):
+        raise exc
+
+    return decode
+
+
+# Ledgers repeat the same dates over and over, keep the latest ones
+@functools.lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _date(s):
+    if not s:
+        return None
+    # Fast path for the ACE format MM/DD/YYYY
+    if (len(s) == 10 and s[2] == '/' and s[5] == '/' and
+            (s[:2] + s[3:5] + s[6:]).isdecimal()):
+        return datetime.date(int(s[6:]), int(s[:2]), int(s[3:5]))
+    return datetime.datetime.strptime(s, '%m/%d/%Y').date()
+
+
+# New in Python 3.7
+_time_fromisoformat = getattr(datetime.time, 'fromisoformat', None)
+
+
+def _time(s):
+    if not s:
+        return None
+    # Fast path for the ACE format HH:MM:SS[.fff]. _time_fields reads
+    # the hour 12 as 0 even without AM/PM, leave those values to it.
+    if (_time_fromisoformat is not None and
+            (len(s) == 8 or len(s) == 12 and s[8] == '.') and
+            s[2] == ':' and s[5] == ':' and s[:2] != '12'):
+        try:
+            return _time_fromisoformat(s)
+        except ValueError:
+            pass
+    return datetime.time(*_time_fields(s))
+
+
+def _time_fields(s):
+    # HH:MM:SS[.fraction][ AM|PM]
+    try:
+        n = len(s)
+        ampm = None
+        if n > 8 and s[n - 3] == ' ':
+            ampm = s[n - 2:]
+            n -= 3
+            if ampm != 'AM' and ampm != 'PM':
+                raise ValueError(s)
+        if s[2] != ':' or s[5] != ':':
+            raise ValueError(s)
+        hour = int(s[:2])
+        if hour == 12:
+            hour = 0
+        if ampm == 'PM':
+            hour += 12
+        if n == 8:
+            microsecond = 0
+        elif s[8] == '.' and s[9:n].isdecimal():
+            microsecond = int(s[9:n][:6].ljust(6, '0'))
+        else:
+            raise ValueError(s)
+        return hour, int(s[3:5]), int(s[6:8]), microsecond
+    except (ValueError, IndexError):
+        raise OperationalError('Invalid time value %s' % (s, )) from None
+
+
+def _datetime(s):
+    if not s:
+        return None
+    if ' ' in s:
+        sd, st = s.split(' ', 1)
+        return datetime.datetime.combine(_date(sd), _time(st))
+    else:
+        return _date(s)
+
+
+_TEXT_CONVERTERS = {
+    lib.A_DECIMAL: decimal.Decimal,
+    lib.A_DATE: _date,
+    lib.A_TIME: _time,
+    lib.A_TIMESTAMP: _datetime,
+}
+
+
+def _is_int32(value):
+    return _MIN_INT32 <= value <= _MAX_INT32
+
+
+def _is_int64(value):
+    return _MIN_INT64 <= value <= _MAX_INT64
+
+
+def _infer_type(param, value):
+    if isinstance(value, int):
+        if _is_int32(value):
+            return lib.A_VAL32
+        if _is_int64(value):
+            return lib.A_VAL64
+        else:
+            raise DataError('Value out of range {}'.format(value))
+    elif isinstance(value, float):
+        return lib.A_DOUBLE
+    elif isinstance(value, bytes):
+        return lib.A_BINARY
+    else:
+        return lib.A_STRING
+
+
+def connect(connection_string=None, **kwds):
+    if not isinstance(connection_string, str):
+        connection_string = ';'.join('{}={}'.format(*i) for i in kwds.items())
+    connection_string = connection_string.encode('ascii')
+    handler = lib.ads_new_connection()
+    if not handler:
+        raise InternalError(*_error(None))
+    if not lib.ads_connect(handler, connection_string):
+        lib.ads_free_connection(handler)
+        raise OperationalError(*_error(handler))
+    return Connection(handler)
+
+
+def gather(connect_or_pool, queries, max_workers=None):
+    '''
+    Run the queries concurrently, every one on its own connection, and
+    return a list of QueryResult in the same order.
+
+    connect_or_pool is a pool, any object with the acquire and release
+    methods of adsdb3.pool.Pool, or a function that opens a connection.
+    In the latter case the connections are reused by the worker threads
+    and closed at the end. A query is an SQL string or a tuple
+    (operation, parameters).
+
+    The rows of a query that returns a result set are all fetched. The
+    exception raised by a query is stored in its result and does not
+    affect the other queries, elapsed is the time spent running the
+    query, waiting for a connection included.
+    '''
+
+    queries = [
+        (query, ()) if isinstance(query, str) else query
+        for query in queries
+    ]
+    if not queries:
+        return []
+    if max_workers is None:
+        max_workers = min(len(queries), _GATHER_WORKERS)
+    if hasattr(connect_or_pool, 'acquire'):
+        return _gather(connect_or_pool, queries, max_workers)
+    from .pool import Pool
+    with Pool(connect_or_pool, minsize=0, maxsize=max_workers,
+              check=None) as pool:
+        return _gather(pool, queries, max_workers)
+
+
+def _gather(pool, queries, max_workers):
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(
+            lambda query: _run_query(pool, *query),
+            queries
+        ))
+
+
+def _run_query(pool, operation, parameters=()):
+    start = time.perf_counter()
+    rows = description = error = None
+    rowcount = -1
+    try:
+        connection = pool.acquire()
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(operation, parameters)
+                description = cursor.description
+                rowcount = cursor.rowcount
+                if description is not None:
+                    rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            pool.release(connection)
+    except Exception as exc:
+        error = exc
+    elapsed = time.perf_counter() - start
+    return QueryResult(rows, description, rowcount, error, elapsed)
+
+
+def _locked(method):
+    '''
+    Run the method with the lock of the connection held. The ACE calls
+    of a connection must not interleave, the threads that share a
+    connection take turns.
+    '''
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwds):
+        with self._lock:
+            return method(self, *args, **kwds)
+
+    return wrapper
+
+
+class Connection:
+
+    Warning = Warning
+    Error = Error
+    InterfaceError = InterfaceError
+    DatabaseError = DatabaseError
+    DataError = DataError
+    OperationalError = OperationalError
+    IntegrityError = IntegrityError
+    InternalError = InternalError
+    ProgrammingError = ProgrammingError
+    NotSupportedError = NotSupportedError
+
+    encoding = 'Windows-1252'
+
+    def __init__(self, handler, statement_cache_size=_STATEMENT_CACHE_SIZE):
+        self._handler = handler
+        self._lock = threading.RLock()
+        self._statements = _StatementCache(statement_cache_size)
+        self._finalizer = weakref.finalize(
+            self,
+            self._cleanup,
+            handler,
+            self._statements
+        )
+        cursor = self.cursor()
+        try:
+            cursor.execute('SET TRANSACTION AUTOCOMMIT_OFF')
+        finally:
+            cursor.close()
+
+    @property
+    def statement_cache_size(self):
+        return self._statements.maxsize
+
+    @statement_cache_size.setter
+    @_locked
+    def statement_cache_size(self, size):
+        self._statements.resize(size)
+
+    def statement_cache_info(self):
+        return self._statements.info()
+
+    @classmethod
+    def _cleanup(cls, handler, statements):
+        warnings.warn('Implicit connection cleanup', ResourceWarning)
+        # The cached statements are owned by the connection, free them
+        # silently before the handler goes away.
+        statements.clear()
+        cls._close(handler)
+
+    @classmethod
+    def _close(cls, handler):
+        # Ignore rollback errors
+        lib.ads_rollback(handler)
+        try:
+            # XXX: Ignore the error?
+            if not lib.ads_disconnect(handler):
+                raise OperationalError(*_error(handler))
+        finally:
+            lib.ads_free_connection(handler)
+
+    @_locked
+    def close(self):
+        if self._finalizer.detach():
+            try:
+                self._statements.clear()
+            finally:
+                self._close(self._handler)
+                self._handler = None
+
+    def _complain_if_closed(self):
+        if self._handler is None:
+            raise InterfaceError('connection closed')
+
+    def _transaction_raise(self):
+        # Cit. the documentation:
+        # > The error code AE_TRANS_OUT_OF_SEQUENCE will be returned if
+        # > a specific connection handle is given to
+        # > AdsCommitTransaction and that connection is not in a
+        # > transaction
+        # Because we don't want to raise an exception in such case,
+        # ignore it. In autocommit mode ads_commit returns 0 but it does
+        # not set the errno. Just ignore 'internal error: success'.
+        msg, errno = _error(self._handler)
+        if errno not in (lib.AE_SUCCESS, lib.AE_TRANS_OUT_OF_SEQUENCE):
+            raise OperationalError(msg, errno)
+
+    @_locked
+    def _in_transaction(self):
+        in_trans = ffi.new('unsigned short int[1]')
+        if lib.AdsInTransaction(self._handler.handle, in_trans):
+            raise OperationalError(*_error(self._handler))
+        return bool(in_trans[0])
+
+    @_locked
+    def _transaction_count(self):
+        c = ffi.new('unsigned int *')
+        if lib.AdsGetTransactionCount(self._handler.handle, c):
+            raise OperationalError(*_error(self._handler))
+        return c[0]
+
+    @_locked
+    def _begin_transaction(self):
+        if lib.AdsBeginTransaction(self._handler.handle):
+            raise OperationalError(*_error(self._handler))
+
+    @_locked
+    def commit(self):
+        self._complain_if_closed()
+        # Commits all active transactions up to the outer one.
+        while lib.ads_commit(self._handler):
+            pass
+        #  Most likely we committed all work, but in case of error, raise it.
+        self._transaction_raise()
+
+    @_locked
+    def rollback(self):
+        self._complain_if_closed()
+        if not lib.ads_rollback(self._handler):
+            self._transaction_raise()
+
+    def cursor(self):
+        self._complain_if_closed()
+        return Cursor(self)
+
+    @_locked
+    def _prepare_statement(self, operation):
+        stmt = self._statements.get(operation)
+        if stmt is not None:
+            return stmt
+        # since ACE needs 2 NULL chars for utf-16
+        sql = operation.encode('utf-16') + b'\x00'
+        handle = lib.ads_prepare(self._handler, sql, True)
+        if not handle:
+            raise DatabaseError(*_error(self._handler))
+        return _Statement(handle, self._handler, self.encoding, operation,
+                          self._lock)
+
+    @_locked
+    def _release_statement(self, stmt):
+        if self._handler is None:
+            stmt.free()
+        else:
+            self._statements.put(stmt)
+
+
+class _StatementCache:
+    '''
+    LRU cache of the prepared statements of a connection, keyed by the
+    SQL text.
+
+    A statement is removed from the cache while a cursor uses it and it
+    is put back when the cursor is done with it, so two cursors never
+    share the same result set. Evicted statements are freed.
+    '''
+
+    def __init__(self, maxsize):
+        self.maxsize = max(maxsize, 0)
+        self.hits = 0
+        self.misses = 0
+        self._statements = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._statements)
+
+    def info(self):
+        return StatementCacheInfo(
+            self.hits,
+            self.misses,
+            self.maxsize,
+            len(self._statements)
+        )
+
+    def get(self, operation):
+        stmt = self._statements.pop(operation, None)
+        if stmt is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return stmt
+
+    def put(self, stmt):
+        old = self._statements.pop(stmt.operation, None)
+        if old is not None:
+            old.free()
+        self._statements[stmt.operation] = stmt
+        self._evict()
+
+    def resize(self, maxsize):
+        self.maxsize = max(maxsize, 0)
+        self._evict()
+
+    def _evict(self):
+        while len(self._statements) > self.maxsize:
+            _, stmt = self._statements.popitem(last=False)
+            stmt.free()
+
+    def clear(self):
+        while self._statements:
+            _, stmt = self._statements.popitem(last=False)
+            stmt.free()
+
+
+class Cursor:
+
+    arraysize = 1
+    # Warn only the first time a DB-API extension is used by a cursor,
+    # set it to False to never warn
+    warn_extensions = True
+    # Return Row objects instead of tuples
+    lazy_rows = False
+    # Return the long values larger than this number of bytes as
+    # LongValue readers, None to never stream them. Only fetchone and
+    # the iteration stream them, the other fetches read them in full.
+    stream_threshold = None
+    # Return the binary values as memoryviews, see README
+    binary_views = False
+    # Share the equal strings of the character columns
+    intern_strings = False
+    _projection = None
+    _closed = False
+    _stmt = None
+    _rows = None
+    _description = None
+    _rowcount = -1
+
+    @property
+    def connection(self):
+        self._warn_extension('connection')
+        self._complain_if_closed()
+        return self._connection
+
+    @property
+    def description(self):
+        self._complain_if_closed()
+        return self._description
+
+    @property
+    def rowcount(self):
+        self._complain_if_closed()
+        return self._rowcount
+
+    # @property
+    # def encoding(self):
+    #     warnings.warn('DB-API extension cursor.encoding used')
+    #     return self._connection.encoding
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._lock = connection._lock
+        # rows fetched in advance by the iteration
+        self._buffer = collections.deque()
+        self._warned = set()
+
+    def _warn_extension(self, name):
+        if self.warn_extensions and name not in self._warned:
+            self._warned.add(name)
+            warnings.warn('DB-API extension cursor.{} used'.format(name))
+
+    def __iter__(self):
+        self._warn_extension('__iter__()')
+        self._complain_if_closed()
+        return self
+
+    def __next__(self):
+        # Fast path, the checks are done when the buffer is refilled
+        try:
+            return self._buffer.popleft()
+        except IndexError:
+            pass
+        self._warn_extension('__next__()')
+        if not self._refill():
+            raise StopIteration
+        return self._buffer.popleft()
+
+    @_locked
+    def _refill(self):
+        self._complain_if_closed()
+        self._complain_if_noset()
+        if self._streaming():
+            # the long values can be read only on the current row
+            row = next(self._row_iterator(), None)
+            if row is not None:
+                self._buffer.append(row)
+        else:
+            self._buffer.extend(self._stmt.fetch_rows(
+                _BATCH_SIZE,
+                self.lazy_rows,
+                self.binary_views,
+                self.intern_strings
+            ))
+        return bool(self._buffer)
+
+    def _streaming(self):
+        return (
+            self.stream_threshold is not None and
+            self._stmt.has_long_columns()
+        )
+
+    def _row_iterator(self):
+        # One iterator for the whole result set
+        if self._rows is None:
+            self._rows = self._stmt.iter_rows(
+                self.lazy_rows,
+                self.stream_threshold,
+                self.intern_strings
+            )
+        return self._rows
+
+    @_locked
+    def close(self):
+        if not self._closed:
+            self._reset()
+            self._closed = True
+
+    def _reset(self):
+        if self._stmt is not None:
+            self._connection._release_statement(self._stmt)
+        self._stmt = None
+        self._rows = None
+        self._buffer.clear()
+        self._description = None
+        self._rowcount = -1
+
+    def _execute(self, operation, parameters=()):
+        return self._execute_statement(self._prepare(operation), parameters)
+
+    def _prepare(self, operation):
+        self._stmt = self._connection._prepare_statement(operation)
+        return self._stmt
+
+    def _execute_statement(self, stmt, parameters):
+        try:
+            stmt.bind_params(parameters)
+            stmt.execute()
+        except Error:
+            # Do not put back in the cache a statement that failed, it
+            # could refer to objects that do not exist anymore.
+            self._stmt = None
+            stmt.free()
+            raise
+        description = stmt.columns_info()
+        if description is not None:
+            # the statement can come from the cache with the projection
+            # of another cursor
+            description = stmt.project(self._projection)
+        if description is None:
+            rowcount = stmt.affected_rows()
+        else:
+            rowcount = stmt.num_rows()
+        return description, rowcount
+
+    def _complain_if_closed(self):
+        if self._closed:
+            raise InterfaceError('cursor closed')
+        self._connection._complain_if_closed()
+
+    def _complain_if_noset(self):
+        if self._stmt is None:
+            raise InterfaceError('No operation issued')
+        if self._description is None:
+            raise InterfaceError('No results to fetch')
+
+    def _complain_if_moved(self, stmt, executions, operation):
+        # For the methods that release the lock between two batches. The
+        # statement cache returns the same statement for the same SQL,
+        # compare the executions too.
+        if self._stmt is not stmt or stmt.executions != executions:
+            raise InterfaceError('cursor used during {}'.format(operation))
+
+    def _complain_if_buffered(self):
+        # The columnar fetches read straight from the result set
+        if self._buffer:
+            raise InterfaceError(
+                'Rows fetched by the iteration must be fetched first'
+            )
+
+    @_locked
+    def set_projection(self, columns=None):
+        '''
+        Fetch only the given columns, at least one, by index or by name,
+        in the given order. The projection applies to the current result
+        set and to the next ones until it is changed, None restores all
+        the columns. The description matches the projection.
+
+        The columns left out are not read from the result set at all.
+        '''
+
+        self._complain_if_closed()
+        if columns is not None:
+            columns = tuple(columns)
+            if not columns:
+                raise ProgrammingError('Empty projection')
+        if self._stmt is not None and self._description is not None:
+            self._complain_if_buffered()
+            self._description = self._stmt.project(columns)
+            self._rows = None
+        self._projection = columns
+
+    def callproc(self, procname, parameters=()):
+        operation = 'EXECUTE PROCEDURE {procname}({args})'.format(
+            procname=procname,
+            args=','.join(['?'] * len(parameters))
+        )
+        return self.execute(operation, parameters)
+
+    @_locked
+    def execute(self, operation, parameters=()):
+        self._complain_if_closed()
+        self._reset()
+        self._description, self._rowcount = self._execute(
+            operation,
+            parameters
+        )
+
+    @_locked
+    def executemany(self, operation, seq_of_parameters):
+        self._complain_if_closed()
+        self._reset()
+        rowcount_f = False
+        rowcount_s = 0
+        stmt = None
+        for parameters in seq_of_parameters:
+            # Prepare the statement once and only rebind the parameters
+            # for every row
+            if stmt is None:
+                stmt = self._prepare(operation)
+            self._description, rowcount = self._execute_statement(
+                stmt,
+                parameters
+            )
+            if rowcount > 0:
+                rowcount_s += rowcount
+                rowcount_f = True
+        if rowcount_f:
+            self._rowcount = rowcount_s
+
+    def bulk_insert(self, table, columns, rows, batch_size=_BULK_BATCH_SIZE,
+                    commit_every=None):
+        '''
+        Insert rows, sequences of values for columns, in table batch_size
+        rows at a time and return a BulkInsertStats, see the README.
+        '''
+
+        if batch_size < 1:
+            raise ValueError('invalid batch size')
+        if commit_every is not None and commit_every < 1:
+            raise ValueError('invalid commit interval')
+        columns = list(columns)
+        for name in [table] + columns:
+            if not _IDENTIFIER.match(name):
+                raise ProgrammingError('invalid identifier: {!r}'.format(name))
+        operation = 'INSERT INTO {table} ({columns}) VALUES ({params})'.format(
+            table=table,
+            columns=', '.join(columns),
+            params=', '.join(['?'] * len(columns))
+        )
+        start = time.perf_counter()
+        with self._lock:
+            self._complain_if_closed()
+            self._reset()
+            stmt = self._prepare(operation)
+            executions = stmt.executions
+            self._rowcount = 0
+        rows = iter(rows)
+        commits = 0
+        uncommitted = 0
+        try:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                with self._lock:
+                    self._complain_if_closed()
+                    self._complain_if_moved(stmt, executions, 'bulk insert')
+                    for parameters in batch:
+                        self._insert(stmt, parameters, len(columns))
+                        self._rowcount += 1
+                        uncommitted += 1
+                        if uncommitted == commit_every:
+                            self._connection.commit()
+                            commits += 1
+                            uncommitted = 0
+                    executions = stmt.executions
+        except Exception:
+            if commit_every is not None:
+                self._connection.rollback()
+            raise
+        if uncommitted and commit_every is not None:
+            self._connection.commit()
+            commits += 1
+        elapsed = time.perf_counter() - start
+        rate = self._rowcount / elapsed if elapsed > 0 else 0.0
+        return BulkInsertStats(self._rowcount, commits, elapsed, rate)
+
+    def _insert(self, stmt, parameters, width):
+        if len(parameters) != width:
+            raise ProgrammingError(
+                'expected {} values, got {}'.format(width, len(parameters))
+            )
+        try:
+            stmt.bind_params(parameters)
+            stmt.execute()
+        except Error:
+            # See _execute_statement
+            self._stmt = None
+            stmt.free()
+            raise
+
+    @_locked
+    def _fetch(self, size):
+        self._complain_if_closed()
+        self._complain_if_noset()
+        buffer = self._buffer
+        if size == 'one':
+            if buffer:
+                return buffer.popleft()
+            if self.binary_views and not self._streaming():
+                # the views need the batch path
+                rows = self._stmt.fetch_rows(1, self.lazy_rows, True,
+                                             self.intern_strings)
+                return rows[0] if rows else None
+            return next(self._row_iterator(), None)
+        rows = []
+        while buffer and (size == 'all' or len(rows) < size):
+            rows.append(buffer.popleft())
+        if self._streaming():
+            # A LongValue is valid only on its row, read it before the
+            # next one
+            rows.extend([
+                _read_long_values(row) for row in itertools.islice(
+                    self._row_iterator(),
+                    None if size == 'all' else size - len(rows)
+                )
+            ])
+        elif size == 'all':
+            rows.extend(self._stmt.fetch_rows(
+                None,
+                self.lazy_rows,
+                self.binary_views,
+                self.intern_strings
+            ))
+        elif len(rows) < size:
+            rows.extend(self._stmt.fetch_rows(
+                size - len(rows),
+                self.lazy_rows,
+                self.binary_views,
+                self.intern_strings
+            ))
+        return rows
+
+    def fetchone(self):
+        return self._fetch('one')
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        return self._fetch(size)
+
+    def fetchall(self):
+        return self._fetch('all')
+
+    @_locked
+    def fetch_columns(self, size=None):
+        '''
+        Fetch the next size rows, or all the remaining rows if size is
+        None, as columns.
+
+        Return a tuple (columns, nulls). columns has one container for
+        every column of the result set: an array.array for the fixed
+        width types and a list otherwise. nulls has one array.array('B')
+        for every column, set to 1 where the value is NULL. In the arrays
+        a NULL value is stored as 0, in the lists as None.
+        '''
+
+        self._complain_if_closed()
+        self._complain_if_noset()
+        self._complain_if_buffered()
+        return self._stmt.fetch_columns(
+            size,
+            self.binary_views,
+            self.intern_strings
+        )
+
+    def export_csv(self, fileobj, header=True, **fmtparams):
+        '''
+        Write the remaining rows to fileobj, a text file opened with
+        newline='', in CSV format and return the number of rows.
+        '''
+
+        stmt, description = self._start_export()
+        writer = csv.writer(fileobj, **fmtparams)
+        if header:
+            writer.writerow([d[0] for d in description])
+        n = 0
+        for columns in self._export_batches(stmt):
+            columns = [
+                _format_column(column, _CSV_FORMATS) for column in columns
+            ]
+            writer.writerows(zip(*columns))
+            n += len(columns[0])
+        return n
+
+    def export_jsonl(self, fileobj):
+        '''
+        Write the remaining rows to fileobj, a text file, in JSON Lines
+        format and return the number of rows.
+        '''
+
+        stmt, description = self._start_export()
+        keys = [_json_encode(d[0]) + ': ' for d in description]
+        n = 0
+        for columns in self._export_batches(stmt):
+            columns = [
+                [key + value for value in _format_column(
+                    column,
+                    _JSON_FORMATS,
+                    _json_encode
+                )]
+                for key, column in zip(keys, columns)
+            ]
+            fileobj.write(''.join([
+                '{' + ', '.join(row) + '}\n' for row in zip(*columns)
+            ]))
+            n += len(columns[0])
+        return n
+
+    @_locked
+    def _start_export(self):
+        self._complain_if_closed()
+        self._complain_if_noset()
+        self._complain_if_buffered()
+        return self._stmt, self._description
+
+    def _export_batches(self, stmt):
+        # Like bulk_insert, hold the lock only while a batch is fetched
+        executions = stmt.executions
+        batches = stmt.iter_value_columns(self.binary_views)
+        while True:
+            with self._lock:
+                self._complain_if_closed()
+                self._complain_if_moved(stmt, executions, 'export')
+                columns = next(batches, None)
+            if columns is None:
+                break
+            yield columns
+
+    def fetchnumpy(self):
+        '''
+        Fetch all the remaining rows as NumPy arrays.
+
+        Return an OrderedDict that maps the column names to
+        numpy.ma.MaskedArray objects. The mask is set for the NULL
+        values of the nullable columns. Numbers are stored with the
+        matching NumPy type, DATE and TIMESTAMP as datetime64 and the
+        other types as objects.
+        '''
+
+        return self._fetch_numpy(None)
+
+    def fetch_numpy_batches(self, size):
+        '''
+        Iterate over the remaining rows in batches of at most size rows.
+        Every batch has the same layout as the result of fetchnumpy().
+        '''
+
+        if numpy is None:
+            raise NotSupportedError('numpy is not installed')
+        with self._lock:
+            self._complain_if_closed()
+            self._complain_if_noset()
+            self._complain_if_buffered()
+            stmt = self._stmt
+            executions = stmt.executions
+        while True:
+            with self._lock:
+                self._complain_if_closed()
+                self._complain_if_moved(stmt, executions,
+                                        'fetch_numpy_batches')
+                batch = stmt.fetch_numpy(size)
+            if not batch or not len(next(iter(batch.values()))):
+                break
+            yield batch
+
+    def fetch_arrow_batches(self, batch_size, dictionary_encode=False):
+        '''
+        Iterate over the remaining rows as pyarrow.RecordBatch objects of
+        at most batch_size rows.
+
+        The schema is derived from the column descriptions. If
+        dictionary_encode is true the DT_FIXCHAR columns, usually codes
+        with few distinct values, are dictionary encoded.
+        '''
+
+        if pyarrow is None:
+            raise NotSupportedError('pyarrow is not installed')
+        with self._lock:
+            self._complain_if_closed()
+            self._complain_if_noset()
+            self._complain_if_buffered()
+            stmt = self._stmt
+            executions = stmt.executions
+            schema = stmt.arrow_schema(dictionary_encode)
+        while True:
+            with self._lock:
+                self._complain_if_closed()
+                self._complain_if_moved(stmt, executions,
+                                        'fetch_arrow_batches')
+                columns, masks = stmt.fetch_columns(batch_size)
+            n = len(masks[0])
+            if not n:
+                break
+            yield pyarrow.RecordBatch.from_arrays(
+                [
+                    _arrow_array(type, field.type, column, mask)
+                    for type, field, column, mask in zip(
+                        stmt._types, schema, columns, masks
+                    )
+                ],
+                schema=schema
+            )
+            if n < batch_size:
+                break
+
+    @_locked
+    def _fetch_numpy(self, size):
+        if numpy is None:
+            raise NotSupportedError('numpy is not installed')
+        self._complain_if_closed()
+        self._complain_if_noset()
+        self._complain_if_buffered()
+        return self._stmt.fetch_numpy(size)
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def setoutputsize(self, size, column=None):
+        pass
+
+
+class _Statement:
+
+    _description = None
+    _decoders = ()
+    _types = ()
+    _num_cols = 0
+    _data_value = None
+    _converters = ()
+    _batch = None
+    _row_layout = None
+    _all_columns = None
+    _indexes = ()
+    # changes every time the statement moves to another row
+    row_id = 0
+    executions = 0
+    _described = False
+    _params = None
+
+    def __init__(self, stmt, handler, encoding, operation=None, lock=None):
+        self.stmt = stmt
+        if lock is None:
+            lock = threading.RLock()
+        # the lock of the connection
+        self.lock = lock
+        self._finalizer = weakref.finalize(self, self._cleanup, stmt, lock)
+        self.handler = handler
+        self.encoding = encoding
+        self.operation = operation
+
+    @classmethod
+    def _cleanup(cls, stmt, lock):
+        warnings.warn('Implicit statement cleanup', ResourceWarning)
+        # the garbage collector can run in any thread
+        with lock:
+            lib.ads_free_stmt(stmt)
+
+    def free(self):
+        if self._finalizer.detach():
+            lib.ads_free_stmt(self.stmt)
+
+    def num_params(self):
+        ret = lib.ads_num_params(self.stmt)
+        if ret == -1:
+            raise DatabaseError(*_error(self.handler))
+        return ret
+
+    def describe_params(self):
+        # Describe the parameters only once, the following executions
+        # just rebind the values
+        if self._params is None:
+            self._params = _Parameters(self.stmt, self.handler,
+                                       self.num_params())
+        return self._params
+
+    def bind_params(self, params):
+        # A cached statement keeps the values of its last execution,
+        # all of them must be bound again
+        expected = len(self.describe_params())
+        if len(params) != expected:
+            raise ProgrammingError(
+                'expected {} parameters, got {}'.format(expected, len(params))
+            )
+        for i, param in enumerate(params):
+            self.bind(i, param)
+
+    def bind(self, i, value):
+        params = self.describe_params()
+        params.set(i, value, self.encoding)
+        if not lib.ads_bind_param(self.stmt, i, params.params + i):
+            raise DatabaseError(*_error(self.handler))
+
+    def execute(self):
+        self.row_id += 1
+        self.executions += 1
+        if not lib.ads_execute(self.stmt):
+            raise DatabaseError(*_error(self.handler))
+
+    def has_long_columns(self):
+        return any(
+            description[1] in _LONG_TYPES
+            for description in self.columns_info() or ()
+        )
+
+    def num_cols(self):
+        n = lib.ads_num_cols(self.stmt)
+        if n < 0:
+            raise DatabaseError(*_error(self.handler))
+        return n
+
+    def num_rows(self):
+        n = lib.ads_num_rows(self.stmt)
+        return -1 if n < 0 else n
+
+    def affected_rows(self):
+        n = lib.ads_affected_rows(self.stmt)
+        return -1 if n < 0 else n
+
+    def _column_info(self, i):
+        info = ffi.new('struct a_ads_column_info *')
+        lib.ads_get_column_info(self.stmt, i, info)
+        if info.native_type in _UNICODE_FIELD:
+            # Precision and size here are in bytes, so convert it to chars
+            # for unicode fields
+            info.precision = info.precision // 2
+            info.max_size = info.max_size // 2
+        return info
+
+    def column_info(self, i):
+        return self._describe_column(self._column_info(i))
+
+    @staticmethod
+    def _describe_column(info):
+        return (
+            ffi.string(info.name).decode('ascii', 'ignore'),
+            info.native_type,
+            None,
+            info.max_size,
+            info.precision,
+            info.scale,
+            info.nullable
+        )
+
+    def columns_info(self):
+        # The result set layout does not change between executions of
+        # the same statement, describe it only once.
+        if not self._described:
+            n = self.num_cols()
+            if n > 0:
+                infos = [self._column_info(i) for i in range(n)]
+                self._description = tuple(
+                    self._describe_column(info) for info in infos
+                )
+                self._decoders = tuple(
+                    _decoder(info.type, self.encoding) for info in infos
+                )
+                self._types = tuple(info.type for info in infos)
+                self._converters = tuple(
+                    _batch_converter(info.type, self.encoding)
+                    for info in infos
+                )
+                # ads_get_column only fills the pointers of the struct
+                # so one is enough for all the values of the result set
+                self._data_value = ffi.new('struct a_ads_data_value *')
+                self._all_columns = (
+                    self._description,
+                    self._decoders,
+                    self._types,
+                    self._converters
+                )
+            self._indexes = tuple(range(n))
+            self._num_cols = n
+            self._described = True
+        return self._description
+
+    def project(self, columns=None):
+        '''
+        Fetch only the given columns, by index or by name, in the given
+        order, or all the columns if columns is None. Return the
+        description of the projection.
+        '''
+
+        self.columns_info()
+        if self._all_columns is None:
+            return None
+        description, decoders, types, converters = self._all_columns
+        if columns is None:
+            indexes = tuple(range(len(description)))
+        else:
+            # ADS column names are case insensitive
+            names = dict(reversed([
+                (d[0].upper(), i) for i, d in enumerate(description)
+            ]))
+            indexes = []
+            for column in columns:
+                if isinstance(column, str):
+                    try:
+                        column = names[column.upper()]
+                    except KeyError:
+                        raise ProgrammingError(
+                            'Unknown column {0}'.format(column)
+                        )
+                elif not 0 <= column < len(description):
+                    raise ProgrammingError(
+                        'Column index out of range: {0}'.format(column)
+                    )
+                indexes.append(column)
+            indexes = tuple(indexes)
+        if indexes != self._indexes:
+            self._indexes = indexes
+            self._description = tuple(description[i] for i in indexes)
+            self._decoders = tuple(decoders[i] for i in indexes)
+            self._types = tuple(types[i] for i in indexes)
+            self._converters = tuple(converters[i] for i in indexes)
+            self._num_cols = len(indexes)
+            self._batch = None
+            self._row_layout = None
+        return self._description
+
+    @property
+    def row_layout(self):
+        self.columns_info()
+        if self._row_layout is None:
+            self._row_layout = _RowLayout(
+                [description[0] for description in self._description],
+                self._converters
+            )
+        return self._row_layout
+
+    def iter_rows(self, lazy=False, stream_threshold=None, intern=False):
+        '''
+        Iterate over the rows one at a time. If stream_threshold is not
+        None, the values of the long columns larger than
+        stream_threshold bytes are returned as LongValue objects. If
+        intern is true the equal strings are converted once and shared.
+        '''
+
+        self.columns_info()
+        stmt = self.stmt
+        value = self._data_value
+        if stream_threshold is None:
+            streamed = frozenset()
+        else:
+            streamed = frozenset(
+                i for i, description in enumerate(self._description)
+                if description[1] in _LONG_TYPES
+            )
+        if lazy:
+            # Only copy the bytes of the variable length values, Row
+            # converts them on access. The long values are converted
+            # here if they are not streamed.
+            if streamed:
+                layout = _RowLayout(
+                    [description[0] for description in self._description],
+                    tuple(
+                        None if i in streamed else convert
+                        for i, convert in enumerate(self._converters)
+                    )
+                )
+            else:
+                layout = self.row_layout
+            raw = _decoder(lib.A_BINARY, self.encoding)
+            decoders = [
+                decode if type in _CTYPES or i in streamed else raw
+                for i, (type, decode) in enumerate(
+                    zip(self._types, self._decoders)
+                )
+            ]
+        elif intern:
+            raw = _decoder(lib.A_BINARY, self.encoding)
+            decoders = [
+                _interning(raw, _Interner(convert))
+                if (type == lib.A_STRING or type == lib.A_NCHAR) and
+                i not in streamed else decode
+                for i, (type, decode, convert) in enumerate(
+                    zip(self._types, self._decoders, self._converters)
+                )
+            ]
+        else:
+            decoders = self._decoders
+        plan = tuple(
+            (i, index, decode, i in streamed)
+            for i, index, decode in zip(
+                range(self._num_cols),
+                self._indexes,
+                decoders
+            )
+        )
+        empty = (None, ) * self._num_cols
+        fetch_next = lib.ads_fetch_next
+        get_column = lib.ads_get_column
+        get_data_info = lib.ads_get_data_info
+        info = ffi.new('struct a_ads_data_info *')
+        while fetch_next(stmt):
+            self.row_id += 1
+            row = list(empty)
+            for i, index, decode, stream in plan:
+                if stream:
+                    # look at the size before ACE copies the value
+                    if not get_data_info(stmt, index, info):
+                        raise DatabaseError(*_error(self.handler))
+                    if info.is_null:
+                        continue
+                    if info.data_size > stream_threshold:
+                        row[i] = LongValue(self, index, info.data_size,
+                                           self._types[i])
+                        continue
+                if not get_column(stmt, index, value):
+                    raise DatabaseError(*_error(self.handler))
+                if not value.is_null[0]:
+                    row[i] = decode(value)
+            if lazy:
+                yield Row(layout, tuple(row))
+            else:
+                yield tuple(row)
+
+    def fetch_batch(self, max_rows):
+        '''
+        Fetch up to max_rows rows in the batch buffers with a single call
+        to the native loop and return the batch, empty at the end of the
+        result set.
+        '''
+
+        self.columns_info()
+        self.row_id += 1
+        batch = self._batch
+        if batch is None or batch.capacity < max_rows:
+            batch = self._batch = _Batch(
+                self._indexes,
+                self._types,
+                self._converters,
+                max(max_rows, _BATCH_SIZE)
+            )
+        batch.fetch(self.stmt, self.handler, max_rows)
+        return batch
+
+    def iter_batches(self, size=None):
+        n = 0
+        while size is None or n < size:
+            wanted = _BATCH_SIZE if size is None else min(size - n,
+                                                          _BATCH_SIZE)
+            batch = self.fetch_batch(wanted)
+            if batch.rows:
+                yield batch
+            n += batch.rows
+            if batch.rows < wanted:
+                break
+
+    def fetch_rows(self, size=None, lazy=False, views=False, intern=False):
+        rows = []
+        if lazy:
+            layout = self.row_layout
+        for batch in self.iter_batches(size):
+            values = zip(*[
+                batch.values(i, not lazy, views, intern)
+                for i in range(self._num_cols)
+            ])
+            if lazy:
+                rows.extend([Row(layout, raw) for raw in values])
+            else:
+                rows.extend(values)
+        return rows
+
+    def iter_value_columns(self, views=False, intern=False):
+        '''
+        Yield the remaining rows a batch at a time, as a list of columns
+        of values.
+        '''
+
+        for batch in self.iter_batches():
+            yield [
+                batch.values(i, True, views, intern)
+                for i in range(self._num_cols)
+            ]
+
+    def fetch_columns(self, size=None, views=False, intern=False):
+        self.columns_info()
+        columns = [
+            array.array(_FORMATS[type]) if type in _CTYPES else []
+            for type in self._types
+        ]
+        masks = [array.array('B') for i in range(self._num_cols)]
+        for batch in self.iter_batches(size):
+            for i, (column, mask) in enumerate(zip(columns, masks)):
+                if batch.widths[i]:
+                    column.frombytes(batch.data(i))
+                else:
+                    column.extend(batch.values(i, True, views, intern))
+                mask.frombytes(batch.nulls(i))
+        return columns, masks
+
+    def fetch_numpy(self, size=None):
+        self.columns_info()
+        capacity = _NUMPY_CAPACITY if size is None else size
+        columns = [
+            _NumpyColumn(type, description, capacity)
+            for type, description in zip(self._types, self._description)
+        ]
+        n = 0
+        for batch in self.iter_batches(size):
+            if n + batch.rows > capacity:
+                capacity = max(capacity * 2, n + batch.rows)
+                for column in columns:
+                    column.grow(capacity)
+            for i, column in enumerate(columns):
+                column.extend(batch, i, n)
+            n += batch.rows
+        return collections.OrderedDict(
+            (description[0], column.masked(n))
+            for description, column in zip(self._description, columns)
+        )
+
+    def arrow_schema(self, dictionary_encode=False):
+        self.columns_info()
+        return pyarrow.schema([
+            pyarrow.field(
+                description[0],
+                _arrow_type(type, description, dictionary_encode),
+                nullable=bool(description[6])
+            )
+            for type, description in zip(self._types, self._description)
+        ])
+
+
+class LongValue(io.RawIOBase):
+    '''
+    File-like reader of a long value, LONGBINARY, LONGVARCHAR or
+    LONGNVARCHAR, larger than Cursor.stream_threshold. The value is read
+    in chunks from the current row of the result set, so it must be read
+    before the cursor moves to another row.
+
+    The reader returns bytes. encoding is the encoding of a text value,
+    None for binary values, use io.TextIOWrapper(value, value.encoding)
+    to read the text.
+    '''
+
+    def __init__(self, statement, index, size, type):
+        super().__init__()
+        self._statement = statement
+        self._index = index
+        self._row_id = statement.row_id
+        self._offset = 0
+        self._buffer = None
+        self.size = size
+        if type == lib.A_STRING:
+            self.encoding = statement.encoding
+        elif type == lib.A_NCHAR:
+            self.encoding = 'utf-16-le'
+        else:
+            self.encoding = None
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '<LongValue of {0} bytes>'.format(self.size)
+
+    def read_value(self):
+        '''
+        Read the rest of the value, decoded if it is a text value.
+        '''
+
+        data = self.read()
+        if self.encoding is None:
+            return data
+        return data.decode(self.encoding)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._offset
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._offset
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError('invalid whence ({0})'.format(whence))
+        if offset < 0:
+            raise ValueError('negative seek position {0}'.format(offset))
+        self._offset = offset
+        return offset
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        statement = self._statement
+        if (not statement._finalizer.alive or
+                statement.row_id != self._row_id):
+            raise InterfaceError('the cursor moved to another row')
+        view = memoryview(b).cast('B')
+        n = min(len(view), self.size - self._offset)
+        if n <= 0:
+            return 0
+        if self._buffer is None or len(self._buffer) < n:
+            self._buffer = ffi.new('char[]', n)
+        with statement.lock:
+            read = lib.ads_get_data(statement.stmt, self._index, self._offset,
+                                    self._buffer, n)
+        if read < 0:
+            raise DatabaseError(*_error(statement.handler))
+        view[:read] = ffi.buffer(self._buffer, read)
+        self._offset += read
+        return read
+
+
+class _RowLayout:
+    '''
+    Shared by the rows of a result set: the column names and the
+    conversion functions of the raw values.
+    '''
+
+    __slots__ = ('names', 'index', 'converters')
+
+    def __init__(self, names, converters):
+        self.names = tuple(names)
+        # the first column wins if two have the same name
+        self.index = dict(reversed([
+            (name, i) for i, name in enumerate(self.names)
+        ]))
+        self.converters = converters
+
+
+class Row:
+    '''
+    Row of a result set that keeps the raw values and converts a value
+    only when it is accessed, by index, by name or as an attribute.
+
+    Enable it with Cursor.lazy_rows.
+    '''
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._layout.index[key]
+        elif isinstance(key, slice):
+            return tuple(self)[key]
+        value = self._values[key]
+        if value is None:
+            return None
+        convert = self._layout.converters[key]
+        if convert is None:
+            return value
+        return convert(value)
+
+    def __getattr__(self, name):
+        # the slots are not set yet while copying or unpickling
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            i = self._layout.index[name]
+        except KeyError:
+            raise AttributeError(name)
+        return self[i]
+
+    def __reduce__(self):
+        # The converters are not picklable, keep the converted values
+        return _unpickle_row, (self._layout.names, tuple(self))
+
+    def __iter__(self):
+        for i in range(len(self._values)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (Row, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'Row({})'.format(', '.join(
+            '{}={!r}'.format(name, value)
+            for name, value in zip(self._layout.names, self)
+        ))
+
+    def keys(self):
+        return self._layout.names
+
+
+def _read_long_values(row):
+    values = row._values if isinstance(row, Row) else row
+    if not any(isinstance(value, LongValue) for value in values):
+        return row
+    values = tuple(
+        value.read_value() if isinstance(value, LongValue) else value
+        for value in values
+    )
+    if isinstance(row, Row):
+        return Row(row._layout, values)
+    return values
+
+
+def _unpickle_row(names, values):
+    return Row(_RowLayout(names, (None, ) * len(values)), values)
+
+
+class _Batch:
+    '''
+    Buffers filled by adsdb3_fetch_batch, the native fetch loop compiled
+    into _ace. The fixed width values are copied as they are, one
+    contiguous buffer per column, the values of the variable length
+    types are appended to an arena shared by all the columns.
+    '''
+
+    def __init__(self, indexes, types, converters, capacity):
+        self.capacity = capacity
+        self.converters = converters
+        self.num_cols = len(types)
+        self.columns = ffi.new('struct adsdb3_column[]', self.num_cols)
+        self.arena = ffi.gc(
+            ffi.new('struct adsdb3_arena *'),
+            lib.adsdb3_arena_free
+        )
+        self.widths = []
+        self.ctypes = []
+        self.binary = [type == lib.A_BINARY for type in types]
+        self.interners = [
+            _Interner(convert)
+            if type == lib.A_STRING or type == lib.A_NCHAR else None
+            for type, convert in zip(types, converters)
+        ]
+        self._buffers = []
+        for i, (index, type) in enumerate(zip(indexes, types)):
+            column = self.columns[i]
+            column.index = index
+            column.nulls = nulls = ffi.new('unsigned char[]', capacity)
+            if type in _CTYPES:
+                width = _STRUCTS[type].size
+                column.width = width
+                column.data = data = ffi.new('char[]', capacity * width)
+                buffers = nulls, data
+            else:
+                width = 0
+                column.offsets = offsets = ffi.new('size_t[]', capacity)
+                column.lengths = lengths = ffi.new('unsigned int[]', capacity)
+                buffers = nulls, offsets, lengths
+            self.widths.append(width)
+            self.ctypes.append(_CTYPES.get(type))
+            # the struct does not keep the buffers alive
+            self._buffers.append(buffers)
+        self.rows = 0
+        self._arena_data = b''
+
+    def fetch(self, stmt, handler, max_rows):
+        rows = lib.adsdb3_fetch_batch(stmt, self.columns, self.num_cols,
+                                      max_rows, self.arena)
+        if rows == -1:
+            raise DatabaseError(*_error(handler))
+        elif rows < 0:
+            raise MemoryError('Cannot allocate the fetch buffer')
+        self.rows = rows
+        if self.arena.used:
+            self._arena_data = ffi.unpack(self.arena.data, self.arena.used)
+        else:
+            self._arena_data = b''
+        return rows
+
+    def nulls(self, i):
+        return ffi.buffer(self.columns[i].nulls, self.rows)
+
+    def data(self, i):
+        return ffi.buffer(self.columns[i].data, self.rows * self.widths[i])
+
+    def values(self, i, convert=True, views=False, intern=False):
+        '''
+        Return the values of the column as a list, None for NULL. If
+        convert is false the variable length values are left as bytes.
+        If views is true the binary values are memoryviews of the data
+        of the batch instead of copies. If intern is true the equal
+        strings are converted once and shared.
+        '''
+
+        column = self.columns[i]
+        rows = self.rows
+        nulls = ffi.buffer(column.nulls, rows)[:]
+        if self.widths[i]:
+            values = ffi.unpack(ffi.cast(self.ctypes[i], column.data), rows)
+        else:
+            data = self._arena_data
+            if views and self.binary[i]:
+                # the slices of a memoryview do not copy, the views keep
+                # the data of the batch alive
+                data = memoryview(data)
+            convert = self.converters[i] if convert else None
+            values = [
+                data[offset:offset + length] for offset, length in zip(
+                    ffi.unpack(column.offsets, rows),
+                    ffi.unpack(column.lengths, rows)
+                )
+            ]
+            interner = self.interners[i]
+            if convert is not None and intern and interner is not None:
+                values = interner.convert_all(values)
+                if b'\x01' in nulls:
+                    values = [
+                        None if null else value
+                        for null, value in zip(nulls, values)
+                    ]
+                return values
+            elif convert is not None:
+                values = [
+                    None if null else convert(value)
+                    for null, value in zip(nulls, values)
+                ]
+                return values
+        if b'\x01' in nulls:
+            values = [
+                None if null else value for null, value in zip(nulls, values)
+            ]
+        return values
+
+
+def _base64(value):
+    return base64.b64encode(value).decode('ascii')
+
+
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _json_string(format):
+    # for the formats that never need escapes
+    return lambda value: '"' + format(value) + '"'
+
+
+def _json_float(value):
+    if math.isfinite(value):
+        return float.__repr__(value)
+    # JSON has no NaN and no infinities
+    return 'null'
+
+
+_CSV_FORMATS = {
+    bytes: _base64,
+    memoryview: _base64,
+    datetime.date: datetime.date.isoformat,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.time: datetime.time.isoformat,
+}
+_JSON_FORMATS = {
+    bytes: _json_string(_base64),
+    memoryview: _json_string(_base64),
+    datetime.date: _json_string(datetime.date.isoformat),
+    datetime.datetime: _json_string(datetime.datetime.isoformat),
+    datetime.time: _json_string(datetime.time.isoformat),
+    # exact, str() of a finite decimal is a valid JSON number
+    decimal.Decimal: str,
+    str: json.encoder.encode_basestring,
+    int: int.__repr__,
+    float: _json_float,
+    bool: lambda value: 'true' if value else 'false',
+}
+
+
+def _format_column(values, formats, default=None):
+    '''
+    Format every value of a column with the format of its type in
+    formats or with default, the values without a format are left as
+    they are. NULL becomes None, or 'null' if default is given.
+    '''
+
+    types = set(map(type, values))
+    types.discard(type(None))
+    by_type = {kind: formats.get(kind, default) for kind in types}
+    if default is None and not any(by_type.values()):
+        return values
+    null = None if default is None else 'null'
+    if len(by_type) == 1:
+        format, = by_type.values()
+        return [null if value is None else format(value) for value in values]
+    # A TIMESTAMP column mixes dates and datetimes, see _datetime
+    for kind, format in by_type.items():
+        if format is None:
+            by_type[kind] = _unchanged
+    return [
+        null if value is None else by_type[type(value)](value)
+        for value in values
+    ]
+
+
+def _unchanged(value):
+    return value
+
+
+class _Interner:
+    '''
+    Cache of the converted strings of a column, keyed by the raw bytes,
+    for the columns with few distinct values. The cache is bounded and
+    it disables itself when the hit rate of the first lookups is low.
+    '''
+
+    def __init__(self, convert):
+        self.convert = convert
+        self.cache = {}
+        self.enabled = True
+        self.lookups = 0
+        self.hits = 0
+
+    def convert_all(self, values):
+        convert = self.convert
+        if not self.enabled:
+            return [convert(data) for data in values]
+        cache = self.cache
+        get = cache.get
+        room = _INTERN_SIZE - len(cache)
+        result = []
+        misses = 0
+        for data in values:
+            value = get(data)
+            if value is None:
+                value = convert(data)
+                misses += 1
+                if room > 0:
+                    cache[data] = value
+                    room -= 1
+            result.append(value)
+        if self.lookups < _INTERN_SAMPLE:
+            self.lookups += len(values)
+            self.hits += len(values) - misses
+            if (self.lookups >= _INTERN_SAMPLE and
+                    self.hits < self.lookups * _INTERN_MIN_HIT_RATE):
+                self.enabled = False
+                self.cache = {}
+        return result
+
+
+def _interning(decode, interner):
+    convert_all = interner.convert_all
+    return lambda value: convert_all((decode(value), ))[0]
+
+
+class _NumpyColumn:
+    '''
+    Growable NumPy array for a column of a result set. The fixed width
+    values are copied straight from the batch buffers into the array
+    memory, the dates and the timestamps are stored as datetime64 and the
+    other values as objects.
+    '''
+
+    def __init__(self, type, description, capacity):
+        self.nullable = description[6]
+        if type in _CTYPES:
+            if description[1] == lib.DT_BIT and _STRUCTS[type].size == 1:
+                self.dtype = numpy.dtype(numpy.bool_)
+            else:
+                self.dtype = numpy.dtype(_FORMATS[type])
+        elif type == lib.A_DATE:
+            self.dtype = numpy.dtype('datetime64[D]')
+        elif type == lib.A_TIMESTAMP:
+            self.dtype = numpy.dtype('datetime64[us]')
+        else:
+            self.dtype = numpy.dtype(object)
+        if type == lib.A_DATE:
+            self.convert = self._date
+        elif type == lib.A_TIMESTAMP:
+            self.convert = self._timestamp
+        else:
+            self.convert = None
+        self.data = None
+        self.mask = None
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        data = numpy.zeros(capacity, self.dtype)
+        mask = numpy.zeros(capacity, numpy.bool_)
+        if self.data is not None:
+            data[:len(self.data)] = self.data
+            mask[:len(self.mask)] = self.mask
+        self.data = data
+        self.mask = mask
+        if self.dtype.kind in 'Mm':
+            self.ints = data.view(numpy.int64)
+
+    def extend(self, batch, i, start):
+        end = start + batch.rows
+        self.mask[start:end] = numpy.frombuffer(batch.nulls(i), numpy.bool_)
+        if batch.widths[i]:
+            self.data[start:end] = numpy.frombuffer(batch.data(i),
+                                                    self.dtype)
+        elif self.convert is not None:
+            convert = self.convert
+            self.ints[start:end] = [
+                0 if value is None else convert(value)
+                for value in batch.values(i)
+            ]
+        else:
+            self.data[start:end] = batch.values(i)
+
+    @staticmethod
+    def _date(value):
+        return value.toordinal() - _EPOCH_ORDINAL
+
+    @staticmethod
+    def _timestamp(value):
+        days = value.toordinal() - _EPOCH_ORDINAL
+        if isinstance(value, datetime.datetime):
+            seconds = value.hour * 3600 + value.minute * 60 + value.second
+            microsecond = value.microsecond
+        else:
+            seconds = microsecond = 0
+        return (days * 86400 + seconds) * 1000000 + microsecond
+
+    def masked(self, n):
+        mask = self.mask[:n]
+        if not self.nullable and not mask.any():
+            mask = numpy.ma.nomask
+        return numpy.ma.MaskedArray(self.data[:n], mask=mask)
+
+
+def _arrow_type(type, description, dictionary_encode=False):
+    native_type = description[1]
+    if type in _CTYPES:
+        if native_type == lib.DT_BIT and _STRUCTS[type].size == 1:
+            return pyarrow.bool_()
+        return _ARROW_TYPES[type]
+    elif type == lib.A_STRING or type == lib.A_NCHAR:
+        if dictionary_encode and native_type == lib.DT_FIXCHAR:
+            return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        return pyarrow.string()
+    elif type == lib.A_BINARY:
+        return pyarrow.binary()
+    elif type == lib.A_DECIMAL:
+        precision, scale = description[4], description[5]
+        if 0 < precision <= 38 and scale <= precision:
+            return pyarrow.decimal128(precision, scale)
+        return pyarrow.decimal256(76, scale)
+    elif type == lib.A_DATE:
+        return pyarrow.date32()
+    elif type == lib.A_TIME:
+        return pyarrow.time64('us')
+    elif type == lib.A_TIMESTAMP:
+        return pyarrow.timestamp('us')
+    else:
+        raise NotSupportedError('Unsupported data type %s' % (type, ))
+
+
+def _arrow_array(type, arrow_type, column, mask):
+    if type in _CTYPES:
+        # The arrays of the fixed width types are used as they are as
+        # the data buffer of the Arrow array
+        n = len(mask)
+        validity = None
+        if mask.count(1):
+            is_null = pyarrow.Array.from_buffers(
+                pyarrow.uint8(),
+                n,
+                [None, pyarrow.py_buffer(mask)]
+            )
+            validity = pyarrow.compute.equal(is_null, 0).buffers()[1]
+        storage_type = _ARROW_TYPES[type]
+        array = pyarrow.Array.from_buffers(
+            storage_type,
+            n,
+            [validity, pyarrow.py_buffer(column)]
+        )
+        if arrow_type != storage_type:
+            array = array.cast(arrow_type)
+        return array
+    if pyarrow.types.is_dictionary(arrow_type):
+        return pyarrow.array(column, arrow_type.value_type).dictionary_encode()
+    try:
+        return pyarrow.array(column, arrow_type)
+    except pyarrow.ArrowTypeError:
+        if type != lib.A_TIMESTAMP:
+            raise
+        # ACE returns a timestamp without a time as a date
+        return pyarrow.array(
+            [
+                datetime.datetime(v.year, v.month, v.day)
+                if v.__class__ is datetime.date else v
+                for v in column
+            ],
+            arrow_type
+        )
+
+
+class _Parameters:
+    '''
+    Bind buffers of a statement.
+
+    The bind structs, the lengths and the null flags are allocated once,
+    as arrays, when the parameters are described. Every parameter owns
+    a value buffer that is reused for every execution and grows only
+    when a value does not fit.
+    '''
+
+    def __init__(self, stmt, handler, n):
+        self.params = ffi.new('struct a_ads_bind_param[]', n)
+        self.lengths = ffi.new('unsigned int[]', n)
+        self.nulls = ffi.new('unsigned int[]', n)
+        self.types = []
+        self.buffers = []
+        self.views = []
+        for i in range(n):
+            param = self.params + i
+            if not lib.ads_describe_bind_param(stmt, i, param):
+                raise DatabaseError(*_error(handler))
+            param.value.length = self.lengths + i
+            param.value.is_null = self.nulls + i
+            self.types.append(param.value.type)
+            self.buffers.append(ffi.NULL)
+            self.views.append(None)
+            try:
+                self._reserve(i, _STRUCTS[param.value.type].size)
+            except KeyError:
+                self._reserve(i, _MIN_BIND_BUFFER)
+
+    def __len__(self):
+        return len(self.types)
+
+    def _reserve(self, i, size):
+        view = self.views[i]
+        if view is None or len(view) < size:
+            if view is not None:
+                size = max(size, len(view) * 2)
+            self.buffers[i] = buf = ffi.new('char[]', size)
+            self.views[i] = ffi.buffer(buf)
+
+    def set(self, i, value, encoding):
+        param = self.params[i]
+        is_null = value is None
+        self.nulls[i] = is_null
+
+        if is_null:
+            value = 0
+        # restore the described type, a previous value could have
+        # inferred a different one
+        type = self.types[i]
+        if type == lib.A_INVALID_TYPE:
+            type = _infer_type(param, value)
+
+        try:
+            packer = _STRUCTS[type]
+        except KeyError:
+            if isinstance(value, bytes):
+                size = length = len(value)
+            elif isinstance(value, str):
+                type = lib.A_NCHAR
+                value = value.encode('utf-16')
+                size = length = len(value) + 2  # +2 for the BOM chars
+            else:
+                try:
+                    value = str(value).encode('ascii')
+                except UnicodeEncodeError:
+                    raise DataError('Cannot convert value {}'.format(value))
+                size = length = len(value)
+            n = len(value)
+            # keep the value NULL terminated
+            self._reserve(i, n + 2)
+            view = self.views[i]
+            view[:n] = value
+            view[n:n + 2] = b'\x00\x00'
+        else:
+            self._reserve(i, packer.size)
+            packer.pack_into(self.views[i], 0, value)
+            size = length = packer.size
+        param.value.type = type
+        param.value.buffer = self.buffers[i]
+        param.value.buffer_size = size
+        self.lengths[i] = length
+
+
+def Binary(s):
+    # TODO: do the conversion
+    return s
+
+
+def Date(year, month, day):
+    return '{:4}/{:2}/{:2}'.format(year, month, day)
+
+
+def Time(hour, minute, second):
+    return '{:2}:{:2}:{:2}'.format(hour, minute, second)
+
+
+def Timestamp(year, month, day, hour, minute, second):
+    return '{:4}/{:2}/{:2} {:2}:{:2}:{:2}'.format(
+        year, month, day, hour, minute, second
+    )
+
+
+def DateFromTicks(ticks):
+    return Date(*time.localtime(ticks)[:3])
+
+
+def TimeFromTicks(ticks):
+    return Time(*time.localtime(ticks)[3:6])
+
+
+def TimestampFromTicks(ticks):
+    return Timestamp(*time.localtime(ticks)[:6])
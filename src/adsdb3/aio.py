@@ -0,0 +1,321 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+asyncio interface.
+
+The blocking calls of a connection run in a worker thread owned by the
+connection, one at a time and always in the same thread, so the event
+loop is never blocked.
+
+    >>> from adsdb3 import aio
+    >>> connection = await aio.connect(DataSource=path)
+    >>> cursor = connection.cursor()
+    >>> await cursor.execute('SELECT * FROM t WHERE id = ?', (1, ))
+    >>> async for row in cursor:
+    ...     print(row)
+    >>> await connection.close()
+
+A cancelled operation cannot stop the call already running in the worker
+thread, the result set of the cursor is discarded as soon as the call
+returns and the statement goes back to the connection.
+'''
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+
+from . import Error, InterfaceError, connect as _connect
+from .pool import PoolTimeout, ping
+
+
+__all__ = ['connect', 'AsyncConnection', 'AsyncCursor', 'AsyncPool',
+           'create_pool']
+
+
+async def connect(connection_string=None, **kwds):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_event_loop()
+    try:
+        connection = await loop.run_in_executor(
+            executor,
+            functools.partial(_connect, connection_string, **kwds)
+        )
+    except BaseException:
+        executor.shutdown(wait=False)
+        raise
+    return AsyncConnection(connection, executor, loop)
+
+
+def _discard(cursor):
+    with cursor._lock:
+        cursor._reset()
+
+
+class AsyncConnection:
+
+    def __init__(self, connection, executor, loop):
+        self._connection = connection
+        self._executor = executor
+        self._loop = loop
+        self._shutdown = False
+
+    @property
+    def connection(self):
+        '''
+        The wrapped adsdb3.Connection, call its methods only through
+        run().
+        '''
+
+        return self._connection
+
+    @property
+    def closed(self):
+        return self._shutdown
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def cursor(self):
+        return AsyncCursor(self, self._connection.cursor())
+
+    async def commit(self):
+        await self.run(self._connection.commit)
+
+    async def rollback(self):
+        await self.run(self._connection.rollback)
+
+    def run(self, func, *args):
+        '''
+        Run func(*args) in the worker thread of the connection.
+        '''
+
+        if self._shutdown:
+            raise InterfaceError('connection closed')
+        return self._loop.run_in_executor(
+            self._executor,
+            functools.partial(func, *args)
+        )
+
+    async def close(self):
+        if self._shutdown:
+            return
+        try:
+            await self.run(self._connection.close)
+        finally:
+            self._shutdown = True
+            self._executor.shutdown(wait=False)
+
+    def _close_soon(self):
+        if self._shutdown:
+            return
+        # Queued after the running call, if any
+        self._executor.submit(self._connection.close)
+        self._shutdown = True
+        self._executor.shutdown(wait=False)
+
+
+class AsyncCursor:
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    @property
+    def connection(self):
+        return self._connection
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, size):
+        self._cursor.arraysize = size
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        row = await self.fetchone()
+        if row is None:
+            raise StopAsyncIteration
+        return row
+
+    async def _run(self, func, *args):
+        try:
+            return await self._connection.run(func, *args)
+        except asyncio.CancelledError:
+            # The worker runs the calls in order, the result set is
+            # discarded after the interrupted call.
+            if not self._connection.closed:
+                self._connection._executor.submit(_discard, self._cursor)
+            raise
+
+    async def close(self):
+        await self._connection.run(self._cursor.close)
+
+    async def callproc(self, procname, parameters=()):
+        return await self._run(self._cursor.callproc, procname, parameters)
+
+    async def execute(self, operation, parameters=()):
+        await self._run(self._cursor.execute, operation, parameters)
+
+    async def executemany(self, operation, seq_of_parameters):
+        await self._run(
+            self._cursor.executemany,
+            operation,
+            seq_of_parameters
+        )
+
+    async def fetchone(self):
+        return await self._run(self._cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        return await self._run(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._run(self._cursor.fetchall)
+
+
+class AsyncPool:
+    '''
+    Pool of AsyncConnection objects, at most maxsize open at the same
+    time.
+
+    connect is a coroutine function called without arguments that
+    returns a new AsyncConnection. check runs in the worker thread of the
+    connection on checkout, see adsdb3.pool.Pool. The returned
+    connections are rolled back.
+    '''
+
+    def __init__(self, connect, maxsize=10, timeout=None, check=ping):
+        if maxsize < 1:
+            raise ValueError('invalid pool size')
+        self._connect = connect
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.check = check
+        self._semaphore = asyncio.Semaphore(maxsize)
+        self._idle = collections.deque()
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    async def fill(self, size):
+        '''
+        Open connections until the pool has size idle connections.
+        '''
+
+        while len(self._idle) < min(size, self.maxsize):
+            self._idle.append(await self._connect())
+
+    async def acquire(self, timeout=None):
+        if self._closed:
+            raise InterfaceError('pool closed')
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(
+                'no connection available in {} seconds'.format(timeout)
+            )
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                if await self._healthy(connection):
+                    return connection
+            return await self._connect()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _healthy(self, connection):
+        if self.check is None:
+            return True
+        try:
+            await connection.run(self.check, connection.connection)
+        except Error:
+            connection._close_soon()
+            return False
+        except BaseException:
+            connection._close_soon()
+            raise
+        return True
+
+    async def release(self, connection):
+        try:
+            await connection.rollback()
+        except Error:
+            connection._close_soon()
+            self._semaphore.release()
+            return
+        except BaseException:
+            connection._close_soon()
+            self._semaphore.release()
+            raise
+        if self._closed:
+            connection._close_soon()
+        else:
+            self._idle.append(connection)
+        self._semaphore.release()
+
+    def connection(self, timeout=None):
+        '''
+        Asynchronous context manager that checks out a connection.
+        '''
+
+        return _PoolConnection(self, timeout)
+
+    async def close(self):
+        self._closed = True
+        while self._idle:
+            await self._idle.pop().close()
+
+
+class _PoolConnection:
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.connection = None
+
+    async def __aenter__(self):
+        self.connection = await self.pool.acquire(self.timeout)
+        return self.connection
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.pool.release(self.connection)
+
+
+async def create_pool(connect, minsize=1, maxsize=10, timeout=None,
+                      check=ping):
+    pool = AsyncPool(connect, maxsize, timeout, check)
+    await pool.fill(minsize)
+    return pool
@@ -0,0 +1,209 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+Write the result set of a cursor to a Parquet or an Arrow IPC file,
+requires pyarrow.
+
+    >>> from adsdb3 import export
+    >>> cursor.execute('SELECT * FROM orders')
+    >>> stats = export.to_parquet(cursor, 'orders.parquet')
+
+The rows are fetched and written a row group, or a record batch, at a
+time so the memory used does not depend on the size of the result set.
+The Arrow types are the ones of Cursor.fetch_arrow_batches: the decimals
+keep the precision and the scale of the column, the timestamps are in
+microseconds and the character columns, NVARCHAR included, are strings.
+'''
+
+import collections
+
+from . import NotSupportedError
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+__all__ = ['to_parquet', 'to_arrow_ipc', 'ExportStats', 'ColumnStats']
+
+
+ExportStats = collections.namedtuple('ExportStats', 'rows batches columns')
+ColumnStats = collections.namedtuple(
+    'ColumnStats',
+    'name type null_count encodings compression compressed_size '
+    'uncompressed_size'
+)
+
+_ROW_GROUP_SIZE = 65536
+
+
+def _schema(cursor, dictionary_encode):
+    if pyarrow is None:
+        raise NotSupportedError('pyarrow is not installed')
+    with cursor._lock:
+        cursor._complain_if_closed()
+        cursor._complain_if_noset()
+        return cursor._stmt.arrow_schema(dictionary_encode)
+
+
+def to_parquet(cursor, where, row_group_size=_ROW_GROUP_SIZE,
+               dictionary_encode=False, **options):
+    '''
+    Write the remaining rows of the result set of cursor to where, a
+    path or a file object, in Parquet format with at most
+    row_group_size rows in every row group. options are passed to
+    pyarrow.parquet.ParquetWriter, e.g. compression.
+
+    Return an ExportStats with a ColumnStats for every column, the
+    sizes are the total of the column chunks in the file.
+    '''
+
+    schema = _schema(cursor, dictionary_encode)
+    collector = []
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(where, schema,
+                                       metadata_collector=collector,
+                                       **options) as writer:
+        for batch in cursor.fetch_arrow_batches(row_group_size,
+                                                dictionary_encode):
+            writer.write_batch(batch, row_group_size=row_group_size)
+            rows += batch.num_rows
+    if collector:
+        metadata = collector[0]
+    else:
+        metadata = pyarrow.parquet.read_metadata(where)
+    return ExportStats(
+        rows,
+        metadata.num_row_groups,
+        [
+            _parquet_column_stats(metadata, i, field)
+            for i, field in enumerate(schema)
+        ]
+    )
+
+
+def _parquet_column_stats(metadata, i, field):
+    null_count = 0
+    encodings = []
+    compression = None
+    compressed_size = uncompressed_size = 0
+    for j in range(metadata.num_row_groups):
+        chunk = metadata.row_group(j).column(i)
+        statistics = chunk.statistics
+        if null_count is not None and statistics is not None and \
+                statistics.has_null_count:
+            null_count += statistics.null_count
+        else:
+            null_count = None
+        for encoding in chunk.encodings:
+            if encoding not in encodings:
+                encodings.append(encoding)
+        compression = chunk.compression
+        compressed_size += chunk.total_compressed_size
+        uncompressed_size += chunk.total_uncompressed_size
+    return ColumnStats(
+        field.name,
+        field.type,
+        null_count,
+        tuple(encodings),
+        compression,
+        compressed_size,
+        uncompressed_size
+    )
+
+
+def to_arrow_ipc(cursor, where, batch_size=_ROW_GROUP_SIZE,
+                 dictionary_encode=False, compression=None):
+    '''
+    Write the remaining rows of the result set of cursor to where, a
+    path or a file object, in the Arrow IPC file format with at most
+    batch_size rows in every record batch. compression is 'lz4',
+    'zstd' or None. With dictionary_encode the dictionary of a column
+    is written once and the following batches add only the new values.
+
+    Return an ExportStats with a ColumnStats for every column. The IPC
+    format does not tell the compressed size of a column, it is None
+    and uncompressed_size is the size of the Arrow buffers.
+    '''
+
+    schema = _schema(cursor, dictionary_encode)
+    options = pyarrow.ipc.IpcWriteOptions(compression=compression,
+                                          emit_dictionary_deltas=True)
+    dictionaries = _Dictionaries(schema)
+    null_counts = [0] * len(schema)
+    sizes = [0] * len(schema)
+    rows = batches = 0
+    with pyarrow.ipc.new_file(where, schema, options=options) as writer:
+        for batch in cursor.fetch_arrow_batches(batch_size,
+                                                dictionary_encode):
+            batch = dictionaries.unify(batch)
+            writer.write_batch(batch)
+            for i, column in enumerate(batch.columns):
+                null_counts[i] += column.null_count
+                sizes[i] += column.nbytes
+            rows += batch.num_rows
+            batches += 1
+    return ExportStats(
+        rows,
+        batches,
+        [
+            ColumnStats(
+                field.name,
+                field.type,
+                null_count,
+                ('DICTIONARY', ) if pyarrow.types.is_dictionary(field.type)
+                else ('PLAIN', ),
+                (compression or 'uncompressed').upper(),
+                None,
+                size
+            )
+            for field, null_count, size in zip(schema, null_counts, sizes)
+        ]
+    )
+
+
+class _Dictionaries:
+    '''
+    One dictionary for every dictionary encoded column that only grows,
+    the IPC file format does not allow to replace the dictionary of a
+    column with the one of the next batch, only to extend it.
+    '''
+
+    def __init__(self, schema):
+        self.dictionaries = {
+            i: None for i, field in enumerate(schema)
+            if pyarrow.types.is_dictionary(field.type)
+        }
+
+    def unify(self, batch):
+        '''
+        Return batch with its dictionary columns encoded against the
+        dictionaries of the previous batches, extended with the new
+        values.
+        '''
+
+        if not self.dictionaries:
+            return batch
+        compute = pyarrow.compute
+        columns = batch.columns
+        for i, previous in self.dictionaries.items():
+            column = columns[i]
+            dictionary = column.dictionary
+            if previous is not None:
+                new = dictionary.filter(compute.invert(
+                    compute.is_in(dictionary, value_set=previous)
+                ))
+                dictionary = pyarrow.concat_arrays([previous, new])
+                positions = compute.index_in(column.dictionary,
+                                             value_set=dictionary)
+                indices = positions.take(column.indices)
+                columns[i] = pyarrow.DictionaryArray.from_arrays(
+                    indices.cast(column.type.index_type),
+                    dictionary
+                )
+            self.dictionaries[i] = dictionary
+        return pyarrow.RecordBatch.from_arrays(columns, schema=batch.schema)
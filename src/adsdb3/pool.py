@@ -0,0 +1,343 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+Thread safe pool of connections.
+
+    >>> import functools
+    >>> import adsdb3
+    >>> from adsdb3.pool import Pool
+    >>> pool = Pool(functools.partial(adsdb3.connect, DataSource=path),
+    ...             minsize=2, maxsize=10)
+    >>> with pool.connection() as connection:
+    ...     cursor = connection.cursor()
+    ...     ...
+'''
+
+import collections
+import contextlib
+import threading
+import time
+
+from . import Error, InterfaceError, OperationalError
+
+
+__all__ = ['Pool', 'PoolStats', 'PoolTimeout', 'ping']
+
+
+PoolStats = collections.namedtuple(
+    'PoolStats',
+    'size idle in_use checkouts waits wait_time max_wait timeouts'
+)
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+def ping(connection):
+    '''
+    Default health check, run a trivial query on the connection.
+    '''
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1 FROM system.iota')
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class _Slot:
+
+    __slots__ = ('connection', 'created', 'last_used')
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.last_used = now
+
+
+class Pool:
+    '''
+    Keep between minsize and maxsize connections open.
+
+    connect is called without arguments to open a new connection. A
+    connection is closed when it is older than max_lifetime seconds or,
+    if the pool has more than minsize connections, when it is idle for
+    more than idle_timeout seconds. check is called with the connection
+    on checkout, if it raises the connection is discarded and another
+    one is tried. A returned connection is rolled back.
+
+    A background thread opens the first minsize connections and keeps
+    the pool in shape.
+    '''
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, connect, minsize=1, maxsize=10, max_lifetime=None,
+                 idle_timeout=None, timeout=None, check=ping):
+        if not 0 <= minsize <= maxsize or maxsize < 1:
+            raise ValueError('invalid pool size')
+        self._connect = connect
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.check = check
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)
+        # a different condition, the maintainer must not steal the
+        # notifications for the waiting threads
+        self._wakeup = threading.Condition(lock)
+        # the idle connections, the most recently used at the right
+        self._idle = collections.deque()
+        self._in_use = {}
+        # the open connections plus the ones being opened
+        self._size = 0
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._maintainer = threading.Thread(
+            target=self._maintain,
+            name='adsdb3-pool',
+            daemon=True
+        )
+        self._maintainer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _expired(self, slot, now):
+        return (
+            self.max_lifetime is not None and
+            now - slot.created >= self.max_lifetime
+        )
+
+    def _idle_expired(self, slot, now):
+        return (
+            self.idle_timeout is not None and
+            now - slot.last_used >= self.idle_timeout
+        )
+
+    def _open(self):
+        # Called with _size already incremented, undo it on failure
+        try:
+            connection = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return _Slot(connection, self.clock())
+
+    def _discard(self, slot):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+            # below the minimum size, replace it now
+            if self._size < self.minsize:
+                self._wakeup.notify()
+        try:
+            slot.connection.close()
+        except Error:
+            pass
+
+    def _maintain(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = self.clock()
+                expired = []
+                # the oldest idle connections are at the left
+                for slot in list(self._idle):
+                    if self._expired(slot, now) or (
+                        self._size - len(expired) > self.minsize and
+                        self._idle_expired(slot, now)
+                    ):
+                        self._idle.remove(slot)
+                        expired.append(slot)
+                missing = self.minsize - (self._size - len(expired))
+                if missing > 0:
+                    self._size += missing
+            for slot in expired:
+                self._discard(slot)
+            reserved = max(missing, 0)
+            try:
+                while reserved:
+                    # _open releases its own slot when it fails
+                    reserved -= 1
+                    slot = self._open()
+                    with self._cond:
+                        self._idle.append(slot)
+                        self._cond.notify()
+            except Exception:
+                # try again later, whatever connect raised
+                pass
+            finally:
+                if reserved:
+                    with self._cond:
+                        self._size -= reserved
+                        self._cond.notify()
+            with self._cond:
+                if self._closed:
+                    break
+                self._wakeup.wait(self._maintain_interval())
+        self._close_idle()
+
+    def _maintain_interval(self):
+        intervals = [1.0]
+        if self.max_lifetime is not None:
+            intervals.append(self.max_lifetime / 2)
+        if self.idle_timeout is not None:
+            intervals.append(self.idle_timeout / 2)
+        return min(intervals)
+
+    def acquire(self, timeout=None):
+        '''
+        Check out a connection, wait at most timeout seconds, or the
+        timeout of the pool, for a free one and raise PoolTimeout.
+        '''
+
+        if timeout is None:
+            timeout = self.timeout
+        start = self.clock()
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise InterfaceError('pool closed')
+                    if self._idle:
+                        slot = self._idle.pop()
+                        break
+                    if self._size < self.maxsize:
+                        self._size += 1
+                        slot = None
+                        break
+                    if timeout is None:
+                        remaining = None
+                    else:
+                        remaining = start + timeout - self.clock()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                'no connection available in {} seconds'
+                                .format(timeout)
+                            )
+                    waited = True
+                    self._cond.wait(remaining)
+            if slot is None:
+                slot = self._open()
+                break
+            try:
+                usable = (
+                    not self._expired(slot, self.clock()) and
+                    self._healthy(slot)
+                )
+            except BaseException:
+                # the check failed in an unexpected way, do not leak the
+                # slot
+                self._discard(slot)
+                raise
+            if usable:
+                break
+            self._discard(slot)
+        wait_time = self.clock() - start
+        with self._cond:
+            self._in_use[id(slot.connection)] = slot
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time += wait_time
+            self._max_wait = max(self._max_wait, wait_time)
+        return slot.connection
+
+    def _healthy(self, slot):
+        if self.check is None:
+            return True
+        try:
+            self.check(slot.connection)
+        except Error:
+            return False
+        return True
+
+    def release(self, connection):
+        '''
+        Return a connection to the pool. The transaction in progress is
+        rolled back.
+        '''
+
+        with self._cond:
+            try:
+                slot = self._in_use.pop(id(connection))
+            except KeyError:
+                raise InterfaceError('connection not checked out from pool')
+        try:
+            connection.rollback()
+        except Error:
+            self._discard(slot)
+            return
+        now = self.clock()
+        with self._cond:
+            if not self._closed and not self._expired(slot, now):
+                slot.last_used = now
+                self._idle.append(slot)
+                self._cond.notify()
+                return
+        self._discard(slot)
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def _close_idle(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for slot in idle:
+            self._discard(slot)
+
+    def close(self):
+        '''
+        Close the idle connections, the ones in use are closed when they
+        are returned.
+        '''
+
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            self._wakeup.notify()
+        if self._maintainer is not threading.current_thread():
+            self._maintainer.join()
+        self._close_idle()
+
+    def stats(self):
+        with self._cond:
+            return PoolStats(
+                self._size,
+                len(self._idle),
+                len(self._in_use),
+                self._checkouts,
+                self._waits,
+                self._wait_time,
+                self._max_wait,
+                self._timeouts
+            )
@@ -0,0 +1,1026 @@
+/*
+ * Copyright (c) 2018 Marco Giusti
+ *
+ * Stand-in for the Advantage Client Engine, it implements the functions
+ * declared in src/ace.h and serves synthetic result sets, no server is
+ * needed. Use it to test and profile the driver locally:
+ *
+ *     $ make -C test/fakeace
+ *     $ ADSDB3_ACE_LIBRARY_DIR=test/fakeace python src/ace_build.py
+ *
+ * Every statement that starts with SELECT or EXECUTE has a result set,
+ * the other statements affect one row. The shape of the result sets is
+ * given by options, key=value pairs, in the connection string or in a
+ * comment of the SQL that starts with "fake", which wins. For example
+ * the comment "fake rows=1000 nulls=0.1 columns=integer,varchar(20)".
+ * The options are:
+ *
+ *     rows          number of rows, 10 by default
+ *     nulls         fraction of NULL values, 0 by default
+ *     columns       comma separated types of the columns, named col1,
+ *                   col2, ...: integer, short, bigint, autoinc, logical,
+ *                   double, numeric(p,s), money, char(n), varchar(n),
+ *                   memo, nchar(n), nvarchar(n), nmemo, raw(n), blob,
+ *                   date, time, timestamp
+ *     blobsize      size of the memo and blob values, 64 by default
+ *     latency       microseconds added to every connect, prepare,
+ *                   execute, commit and rollback
+ *     fetchlatency  microseconds added to every fetched row
+ *     echo          only in the SQL, return one row with the values of
+ *                   the bound parameters
+ *
+ * In the connection string the options can have a Fake prefix, e.g.
+ * FakeRows=1000. The values are a function of the row and the column,
+ * the same query always returns the same rows. A statement that
+ * contains "syntax error" fails to prepare, one that contains "raise
+ * error" fails to execute.
+ */
+
+#include <pthread.h>
+#include <stdint.h>
+#include <stddef.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdio.h>
+#include <ctype.h>
+#include <time.h>
+#include <errno.h>
+
+#include "ace.h"
+
+#define FAKE_MAX_COLS 256
+#define FAKE_MAX_CONNS 1024
+#define FAKE_BUF 128
+
+struct fake_column {
+    char name[32];
+    enum a_ads_data_type type;
+    enum a_ads_native_type native_type;
+    unsigned int size;
+    unsigned short precision;
+    unsigned short scale;
+};
+
+struct fake_config {
+    long rows;
+    double nulls;
+    long latency;
+    long fetch_latency;
+    long blob_size;
+    int ncols;
+    struct fake_column cols[FAKE_MAX_COLS];
+};
+
+struct fake_conn {
+    struct a_ads_connection base;
+    int connected;
+    int errcode;
+    char errmsg[ADS_MAX_ERROR_LEN];
+    unsigned int trans_count;
+    struct fake_config config;
+};
+
+struct fake_param {
+    int bound;
+    struct a_ads_bind_param param;
+};
+
+struct a_ads_stmt {
+    struct fake_conn *conn;
+    char *sql;
+    int nparams;
+    struct fake_param *params;
+    int has_result;
+    int executed;
+    int echo;
+    long row;
+    struct fake_config config;
+    /* current column value storage */
+    char **bufs;
+    size_t *bufsizes;
+    unsigned int *lengths;
+    unsigned int *nulls;
+};
+
+static struct fake_conn *fake_conns[FAKE_MAX_CONNS];
+static pthread_mutex_t fake_conns_lock = PTHREAD_MUTEX_INITIALIZER;
+static int fake_initialized = 0;
+
+static void fake_sleep(long usec)
+{
+    struct timespec ts;
+    if (usec <= 0)
+        return;
+    ts.tv_sec = usec / 1000000;
+    ts.tv_nsec = (usec % 1000000) * 1000;
+    while (nanosleep(&ts, &ts) == -1 && errno == EINTR)
+        ;
+}
+
+static void fake_set_error(struct fake_conn *conn, int code, const char *msg)
+{
+    if (conn == NULL)
+        return;
+    conn->errcode = code;
+    snprintf(conn->errmsg, sizeof(conn->errmsg), "%s", msg);
+}
+
+static int fake_strncaseeq(const char *a, const char *b, size_t n)
+{
+    size_t i;
+    for (i = 0; i < n; i++) {
+        if (tolower((unsigned char)a[i]) != tolower((unsigned char)b[i]))
+            return 0;
+        if (a[i] == '\0')
+            return 1;
+    }
+    return 1;
+}
+
+static const char *fake_strcasestr(const char *hay, const char *needle)
+{
+    size_t n = strlen(needle);
+    for (; *hay; hay++)
+        if (fake_strncaseeq(hay, needle, n))
+            return hay;
+    return NULL;
+}
+
+static int fake_parse_type(const char *spec, size_t len, struct fake_column *col)
+{
+    char name[32];
+    size_t n = 0;
+    unsigned int a = 0, b = 0;
+    const char *p = spec, *end = spec + len;
+
+    while (p < end && isspace((unsigned char)*p))
+        p++;
+    while (p < end && (isalnum((unsigned char)*p) || *p == '_') && n < sizeof(name) - 1)
+        name[n++] = (char)tolower((unsigned char)*p++);
+    name[n] = '\0';
+    if (p < end && *p == '(') {
+        a = (unsigned int)strtoul(p + 1, (char **)&p, 10);
+        if (p < end && *p == ',')
+            b = (unsigned int)strtoul(p + 1, (char **)&p, 10);
+    }
+    col->precision = 0;
+    col->scale = 0;
+    if (!strcmp(name, "integer") || !strcmp(name, "int")) {
+        col->type = A_VAL32; col->native_type = DT_INT; col->size = 4;
+        col->precision = 10;
+    } else if (!strcmp(name, "short") || !strcmp(name, "smallint")) {
+        col->type = A_VAL16; col->native_type = DT_SMALLINT; col->size = 2;
+        col->precision = 5;
+    } else if (!strcmp(name, "bigint") || !strcmp(name, "autoinc64")) {
+        col->type = A_VAL64; col->native_type = DT_BIGINT; col->size = 8;
+        col->precision = 19;
+    } else if (!strcmp(name, "autoinc")) {
+        col->type = A_UVAL32; col->native_type = DT_UNSINT; col->size = 4;
+        col->precision = 10;
+    } else if (!strcmp(name, "logical")) {
+        col->type = A_UVAL8; col->native_type = DT_BIT; col->size = 1;
+        col->precision = 1;
+    } else if (!strcmp(name, "double")) {
+        col->type = A_DOUBLE; col->native_type = DT_DOUBLE; col->size = 8;
+        col->precision = 15;
+    } else if (!strcmp(name, "numeric") || !strcmp(name, "money")) {
+        col->type = A_DECIMAL; col->native_type = DT_DECIMAL;
+        col->precision = a ? a : 18;
+        col->scale = b ? b : 4;
+        col->size = col->precision + 2;
+    } else if (!strcmp(name, "char")) {
+        col->type = A_STRING; col->native_type = DT_FIXCHAR;
+        col->size = col->precision = a ? a : 10;
+    } else if (!strcmp(name, "varchar")) {
+        col->type = A_STRING; col->native_type = DT_VARCHAR;
+        col->size = col->precision = a ? a : 30;
+    } else if (!strcmp(name, "memo")) {
+        col->type = A_STRING; col->native_type = DT_LONGVARCHAR;
+        col->size = 0x7fffffff; col->precision = 0;
+    } else if (!strcmp(name, "nchar")) {
+        col->type = A_NCHAR; col->native_type = DT_NFIXCHAR;
+        col->precision = a ? a : 10; col->size = 2 * col->precision;
+    } else if (!strcmp(name, "nvarchar")) {
+        col->type = A_NCHAR; col->native_type = DT_NVARCHAR;
+        col->precision = a ? a : 30; col->size = 2 * col->precision;
+    } else if (!strcmp(name, "nmemo")) {
+        col->type = A_NCHAR; col->native_type = DT_LONGNVARCHAR;
+        col->size = 0x7ffffffe; col->precision = 0;
+    } else if (!strcmp(name, "raw") || !strcmp(name, "binary")) {
+        col->type = A_BINARY; col->native_type = DT_BINARY;
+        col->size = col->precision = a ? a : 16;
+    } else if (!strcmp(name, "blob")) {
+        col->type = A_BINARY; col->native_type = DT_LONGBINARY;
+        col->size = 0x7fffffff; col->precision = 0;
+    } else if (!strcmp(name, "date")) {
+        col->type = A_DATE; col->native_type = DT_DATE; col->size = 10;
+    } else if (!strcmp(name, "time")) {
+        col->type = A_TIME; col->native_type = DT_TIME; col->size = 12;
+    } else if (!strcmp(name, "timestamp")) {
+        col->type = A_TIMESTAMP; col->native_type = DT_TIMESTAMP;
+        col->size = 23;
+    } else {
+        return 0;
+    }
+    return 1;
+}
+
+static int fake_parse_columns(const char *spec, size_t len, struct fake_config *config)
+{
+    const char *p = spec, *end = spec + len;
+    int depth = 0;
+    const char *start = p;
+
+    config->ncols = 0;
+    for (;; p++) {
+        if (p == end || (*p == ',' && depth == 0) || *p == ';') {
+            if (config->ncols >= FAKE_MAX_COLS)
+                return 0;
+            if (!fake_parse_type(start, (size_t)(p - start),
+                        &config->cols[config->ncols]))
+                return 0;
+            snprintf(config->cols[config->ncols].name, 32, "col%d",
+                    config->ncols + 1);
+            config->ncols++;
+            if (p == end || *p == ';')
+                break;
+            start = p + 1;
+        } else if (*p == '(') {
+            depth++;
+        } else if (*p == ')') {
+            depth--;
+        }
+    }
+    return 1;
+}
+
+static void fake_default_config(struct fake_config *config)
+{
+    memset(config, 0, sizeof(*config));
+    config->rows = 10;
+    config->blob_size = 64;
+    fake_parse_columns("integer,varchar(20)", 19, config);
+}
+
+/* Parse key=value options separated by ';' or whitespace. */
+static int fake_parse_options(const char *s, size_t len, struct fake_config *config)
+{
+    const char *p = s, *end = s + len;
+
+    while (p < end) {
+        const char *key, *val;
+        size_t klen, vlen;
+        int depth = 0;
+
+        while (p < end && (isspace((unsigned char)*p) || *p == ';'))
+            p++;
+        if (p >= end)
+            break;
+        key = p;
+        while (p < end && *p != '=' && *p != ';')
+            p++;
+        klen = (size_t)(p - key);
+        if (p >= end || *p != '=')
+            continue;
+        val = ++p;
+        while (p < end && !((*p == ';' || isspace((unsigned char)*p)) && depth == 0)) {
+            if (*p == '(')
+                depth++;
+            else if (*p == ')')
+                depth--;
+            p++;
+        }
+        vlen = (size_t)(p - val);
+        while (klen && isspace((unsigned char)key[klen - 1]))
+            klen--;
+        if (klen > 4 && fake_strncaseeq(key, "fake", 4)) {
+            key += 4;
+            klen -= 4;
+        }
+        if (klen == 4 && fake_strncaseeq(key, "rows", 4))
+            config->rows = strtol(val, NULL, 10);
+        else if (klen == 5 && fake_strncaseeq(key, "nulls", 5))
+            config->nulls = strtod(val, NULL);
+        else if (klen == 7 && fake_strncaseeq(key, "latency", 7))
+            config->latency = strtol(val, NULL, 10);
+        else if (klen == 12 && fake_strncaseeq(key, "fetchlatency", 12))
+            config->fetch_latency = strtol(val, NULL, 10);
+        else if (klen == 8 && fake_strncaseeq(key, "blobsize", 8))
+            config->blob_size = strtol(val, NULL, 10);
+        else if (klen == 7 && fake_strncaseeq(key, "columns", 7)) {
+            if (!fake_parse_columns(val, vlen, config))
+                return 0;
+        }
+    }
+    return 1;
+}
+
+int ads_init(const char *app_name, unsigned int api_version,
+        unsigned int *version_available)
+{
+    (void)app_name;
+    if (version_available != NULL)
+        *version_available = 1;
+    if (api_version != 1)
+        return 0;
+    fake_initialized = 1;
+    return 1;
+}
+
+void ads_fini(void)
+{
+    fake_initialized = 0;
+}
+
+struct a_ads_connection *ads_new_connection(void)
+{
+    struct fake_conn *conn = calloc(1, sizeof(*conn));
+    int i;
+
+    if (conn == NULL)
+        return NULL;
+    fake_default_config(&conn->config);
+    pthread_mutex_lock(&fake_conns_lock);
+    for (i = 1; i < FAKE_MAX_CONNS; i++) {
+        if (fake_conns[i] == NULL) {
+            fake_conns[i] = conn;
+            conn->base.handle = (uint64_t)i;
+            pthread_mutex_unlock(&fake_conns_lock);
+            return &conn->base;
+        }
+    }
+    pthread_mutex_unlock(&fake_conns_lock);
+    free(conn);
+    return NULL;
+}
+
+void ads_free_connection(struct a_ads_connection *ads_conn)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return;
+    pthread_mutex_lock(&fake_conns_lock);
+    fake_conns[conn->base.handle] = NULL;
+    pthread_mutex_unlock(&fake_conns_lock);
+    free(conn);
+}
+
+int ads_connect(struct a_ads_connection *ads_conn, const char *str)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return 0;
+    if (str == NULL || *str == '\0') {
+        fake_set_error(conn, 6420, "[Fake ACE] No data source given");
+        return 0;
+    }
+    if (!fake_parse_options(str, strlen(str), &conn->config)) {
+        fake_set_error(conn, 7200, "[Fake ACE] Invalid column specification");
+        return 0;
+    }
+    fake_sleep(conn->config.latency);
+    conn->connected = 1;
+    conn->errcode = 0;
+    return 1;
+}
+
+int ads_disconnect(struct a_ads_connection *ads_conn)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return 0;
+    conn->connected = 0;
+    conn->trans_count = 0;
+    return 1;
+}
+
+int ads_commit(struct a_ads_connection *ads_conn)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return 0;
+    fake_sleep(conn->config.latency);
+    if (conn->trans_count == 0) {
+        fake_set_error(conn, AE_TRANS_OUT_OF_SEQUENCE,
+                "[Fake ACE] Not in a transaction");
+        return 0;
+    }
+    conn->trans_count--;
+    return 1;
+}
+
+int ads_rollback(struct a_ads_connection *ads_conn)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return 0;
+    fake_sleep(conn->config.latency);
+    if (conn->trans_count == 0) {
+        fake_set_error(conn, AE_TRANS_OUT_OF_SEQUENCE,
+                "[Fake ACE] Not in a transaction");
+        return 0;
+    }
+    conn->trans_count = 0;
+    return 1;
+}
+
+int ads_error(struct a_ads_connection *ads_conn, char *buffer, size_t size)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (buffer != NULL && size > 0)
+        buffer[0] = '\0';
+    if (conn == NULL)
+        return 0;
+    if (buffer != NULL && size > 0)
+        snprintf(buffer, size, "%s", conn->errmsg);
+    return conn->errcode;
+}
+
+void ads_clear_error(struct a_ads_connection *ads_conn)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    if (conn == NULL)
+        return;
+    conn->errcode = 0;
+    conn->errmsg[0] = '\0';
+}
+
+/* The driver sends UTF-16 with a BOM and a trailing NUL pair. */
+static char *fake_decode_sql(const char *sql_str, int is_utf16)
+{
+    const unsigned char *p = (const unsigned char *)sql_str;
+    size_t n = 0, i;
+    char *out;
+
+    if (!is_utf16)
+        return strdup(sql_str);
+    if (p[0] == 0xff && p[1] == 0xfe)
+        p += 2;
+    while (p[2 * n] || p[2 * n + 1])
+        n++;
+    out = malloc(n + 1);
+    if (out == NULL)
+        return NULL;
+    for (i = 0; i < n; i++)
+        out[i] = p[2 * i + 1] ? '?' : (char)p[2 * i];
+    out[n] = '\0';
+    /* the replacement above must not create parameter markers */
+    for (i = 0; i < n; i++)
+        if (p[2 * i + 1] && out[i] == '?')
+            out[i] = '_';
+    return out;
+}
+
+struct a_ads_stmt *ads_prepare(struct a_ads_connection *ads_conn,
+        const char *sql_str, int is_utf16)
+{
+    struct fake_conn *conn = (struct fake_conn *)ads_conn;
+    struct a_ads_stmt *stmt;
+    const char *p, *opts;
+    int i;
+
+    if (conn == NULL || sql_str == NULL)
+        return NULL;
+    fake_sleep(conn->config.latency);
+    if (!conn->connected) {
+        fake_set_error(conn, 6303, "[Fake ACE] Not connected");
+        return NULL;
+    }
+    stmt = calloc(1, sizeof(*stmt));
+    if (stmt == NULL)
+        return NULL;
+    stmt->conn = conn;
+    stmt->sql = fake_decode_sql(sql_str, is_utf16);
+    stmt->config = conn->config;
+    if (fake_strcasestr(stmt->sql, "syntax error") != NULL) {
+        fake_set_error(conn, 7200,
+                "[Fake ACE] Error 7200:  AQE Error:  State = 42000;   "
+                "NativeError = 2115;  [iAnywhere Solutions][Advantage SQL "
+                "Engine]Expected lexical element not found");
+        free(stmt->sql);
+        free(stmt);
+        return NULL;
+    }
+    opts = fake_strcasestr(stmt->sql, "/*fake");
+    if (opts != NULL) {
+        const char *end = strstr(opts, "*/");
+        if (end == NULL)
+            end = opts + strlen(opts);
+        opts += 6;
+        if (!fake_parse_options(opts, (size_t)(end - opts), &stmt->config)) {
+            fake_set_error(conn, 7200, "[Fake ACE] Invalid fake options");
+            free(stmt->sql);
+            free(stmt);
+            return NULL;
+        }
+        stmt->echo = fake_strcasestr(opts, "echo") != NULL
+            && fake_strcasestr(opts, "echo") < end;
+    }
+    for (p = stmt->sql; *p; p++)
+        if (*p == '?')
+            stmt->nparams++;
+    p = stmt->sql;
+    while (isspace((unsigned char)*p))
+        p++;
+    stmt->has_result = fake_strncaseeq(p, "select", 6)
+        || fake_strncaseeq(p, "execute", 7);
+    if (stmt->nparams > 0) {
+        stmt->params = calloc((size_t)stmt->nparams, sizeof(*stmt->params));
+        if (stmt->params == NULL) {
+            free(stmt->sql);
+            free(stmt);
+            return NULL;
+        }
+    }
+    if (stmt->echo) {
+        stmt->config.rows = 1;
+        stmt->config.ncols = stmt->nparams;
+        for (i = 0; i < stmt->nparams; i++)
+            snprintf(stmt->config.cols[i].name, 32, "param%d", i + 1);
+    }
+    return stmt;
+}
+
+static void fake_free_buffers(struct a_ads_stmt *stmt)
+{
+    int i;
+    if (stmt->bufs != NULL) {
+        for (i = 0; i < stmt->config.ncols; i++)
+            free(stmt->bufs[i]);
+    }
+    free(stmt->bufs);
+    free(stmt->bufsizes);
+    free(stmt->lengths);
+    free(stmt->nulls);
+    stmt->bufs = NULL;
+    stmt->bufsizes = NULL;
+    stmt->lengths = NULL;
+    stmt->nulls = NULL;
+}
+
+void ads_free_stmt(struct a_ads_stmt *stmt)
+{
+    if (stmt == NULL)
+        return;
+    fake_free_buffers(stmt);
+    free(stmt->params);
+    free(stmt->sql);
+    free(stmt);
+}
+
+int ads_num_params(struct a_ads_stmt *stmt)
+{
+    if (stmt == NULL)
+        return 0;
+    return stmt->nparams;
+}
+
+int ads_describe_bind_param(struct a_ads_stmt *stmt, unsigned int index,
+        struct a_ads_bind_param *param)
+{
+    if (stmt == NULL || param == NULL)
+        return 0;
+    if (index >= (unsigned int)stmt->nparams) {
+        fake_set_error(stmt->conn, 7200, "[Fake ACE] Invalid parameter index");
+        return 0;
+    }
+    memset(param, 0, sizeof(*param));
+    param->direction = DD_INPUT;
+    param->value.type = A_INVALID_TYPE;
+    return 1;
+}
+
+int ads_bind_param(struct a_ads_stmt *stmt, unsigned int index,
+        struct a_ads_bind_param *param)
+{
+    if (stmt == NULL || param == NULL)
+        return 0;
+    if (index >= (unsigned int)stmt->nparams) {
+        fake_set_error(stmt->conn, 7200, "[Fake ACE] Invalid parameter index");
+        return 0;
+    }
+    stmt->params[index].bound = 1;
+    stmt->params[index].param = *param;
+    return 1;
+}
+
+static enum a_ads_native_type fake_native_type(enum a_ads_data_type type)
+{
+    switch (type) {
+    case A_BINARY: return DT_BINARY;
+    case A_STRING: return DT_VARCHAR;
+    case A_DOUBLE: return DT_DOUBLE;
+    case A_VAL64: return DT_BIGINT;
+    case A_UVAL64: return DT_UNSBIGINT;
+    case A_VAL32: return DT_INT;
+    case A_UVAL32: return DT_UNSINT;
+    case A_VAL16: return DT_SMALLINT;
+    case A_UVAL16: return DT_UNSSMALLINT;
+    case A_VAL8: return DT_TINYINT;
+    case A_UVAL8: return DT_BIT;
+    case A_NCHAR: return DT_NVARCHAR;
+    case A_DECIMAL: return DT_DECIMAL;
+    case A_DATE: return DT_DATE;
+    case A_TIME: return DT_TIME;
+    case A_TIMESTAMP: return DT_TIMESTAMP;
+    default: return DT_NOTYPE;
+    }
+}
+
+int ads_execute(struct a_ads_stmt *stmt)
+{
+    struct fake_conn *conn;
+    const char *p;
+    int i;
+
+    if (stmt == NULL)
+        return 0;
+    conn = stmt->conn;
+    fake_sleep(stmt->config.latency);
+    if (fake_strcasestr(stmt->sql, "raise error") != NULL) {
+        fake_set_error(conn, 7200,
+                "[Fake ACE] Error 7200:  AQE Error:  State = S0000;   "
+                "NativeError = 7041;  File not found");
+        return 0;
+    }
+    for (i = 0; i < stmt->nparams; i++) {
+        if (!stmt->params[i].bound) {
+            fake_set_error(conn, 7200, "[Fake ACE] Parameter not bound");
+            return 0;
+        }
+    }
+    if (stmt->echo) {
+        for (i = 0; i < stmt->nparams; i++) {
+            struct a_ads_data_value *v = &stmt->params[i].param.value;
+            struct fake_column *col = &stmt->config.cols[i];
+            col->type = v->type;
+            col->native_type = fake_native_type(v->type);
+            col->size = v->buffer_size;
+        }
+    }
+    p = stmt->sql;
+    while (isspace((unsigned char)*p))
+        p++;
+    if (!fake_strncaseeq(p, "set", 3) && conn->trans_count == 0)
+        conn->trans_count = 1;
+    if (fake_strncaseeq(p, "begin", 5))
+        conn->trans_count++;
+    else if (fake_strncaseeq(p, "commit", 6))
+        conn->trans_count--;
+    fake_free_buffers(stmt);
+    if (stmt->has_result && stmt->config.ncols > 0) {
+        size_t n = (size_t)stmt->config.ncols;
+        stmt->bufs = calloc(n, sizeof(*stmt->bufs));
+        stmt->bufsizes = calloc(n, sizeof(*stmt->bufsizes));
+        stmt->lengths = calloc(n, sizeof(*stmt->lengths));
+        stmt->nulls = calloc(n, sizeof(*stmt->nulls));
+        if (stmt->bufs == NULL || stmt->bufsizes == NULL
+                || stmt->lengths == NULL || stmt->nulls == NULL) {
+            fake_set_error(conn, 7200, "[Fake ACE] Out of memory");
+            return 0;
+        }
+    }
+    stmt->row = -1;
+    stmt->executed = 1;
+    conn->errcode = 0;
+    return 1;
+}
+
+static uint64_t fake_hash(uint64_t x)
+{
+    x ^= x >> 33;
+    x *= 0xff51afd7ed558ccdULL;
+    x ^= x >> 33;
+    x *= 0xc4ceb9fe1a85ec53ULL;
+    x ^= x >> 33;
+    return x;
+}
+
+static int fake_reserve(struct a_ads_stmt *stmt, int col, size_t size)
+{
+    if (stmt->bufsizes[col] < size) {
+        char *buf = realloc(stmt->bufs[col], size);
+        if (buf == NULL)
+            return 0;
+        stmt->bufs[col] = buf;
+        stmt->bufsizes[col] = size;
+    }
+    return 1;
+}
+
+static const char *fake_words[] = {
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"
+};
+
+/* Generate the value of a column for the current row */
+static int fake_generate(struct a_ads_stmt *stmt, int col)
+{
+    struct fake_column *c = &stmt->config.cols[col];
+    long row = stmt->row;
+    uint64_t h = fake_hash(((uint64_t)row << 16) ^ (uint64_t)col);
+    char tmp[FAKE_BUF];
+    size_t len = 0, i;
+    char *buf;
+
+    if (stmt->echo) {
+        struct a_ads_data_value *v = &stmt->params[col].param.value;
+        stmt->nulls[col] = v->is_null ? *v->is_null : 0;
+        len = v->length ? *v->length : v->buffer_size;
+        /* the driver counts the NUL terminator of the wide strings */
+        if (v->type == A_NCHAR && len >= 2
+                && !((char *)v->buffer)[len - 1]
+                && !((char *)v->buffer)[len - 2])
+            len -= 2;
+        if (!fake_reserve(stmt, col, len + 1))
+            return 0;
+        if (len)
+            memcpy(stmt->bufs[col], v->buffer, len);
+        stmt->lengths[col] = (unsigned int)len;
+        return 1;
+    }
+    stmt->nulls[col] = (double)(h % 1000000) / 1000000.0 < stmt->config.nulls;
+    h = fake_hash(h);
+    switch (c->type) {
+    case A_DOUBLE: {
+        double d = (double)row + (double)(h % 1000) / 1000.0;
+        if (!fake_reserve(stmt, col, 8)) return 0;
+        memcpy(stmt->bufs[col], &d, 8);
+        len = 8;
+        break;
+    }
+    case A_VAL64: case A_UVAL64: {
+        int64_t v = (int64_t)row * 1000003 + col;
+        if (!fake_reserve(stmt, col, 8)) return 0;
+        memcpy(stmt->bufs[col], &v, 8);
+        len = 8;
+        break;
+    }
+    case A_VAL32: case A_UVAL32: {
+        int32_t v = (int32_t)(row + col);
+        if (!fake_reserve(stmt, col, 4)) return 0;
+        memcpy(stmt->bufs[col], &v, 4);
+        len = 4;
+        break;
+    }
+    case A_VAL16: case A_UVAL16: {
+        int16_t v = (int16_t)(row % 30000);
+        if (!fake_reserve(stmt, col, 2)) return 0;
+        memcpy(stmt->bufs[col], &v, 2);
+        len = 2;
+        break;
+    }
+    case A_VAL8: case A_UVAL8: {
+        uint8_t v = (uint8_t)(h & 1);
+        if (!fake_reserve(stmt, col, 1)) return 0;
+        memcpy(stmt->bufs[col], &v, 1);
+        len = 1;
+        break;
+    }
+    case A_DECIMAL:
+        len = (size_t)snprintf(tmp, sizeof(tmp), "%ld.%0*lu", row,
+                c->scale ? c->scale : 1,
+                (unsigned long)(h % 10000) % (c->scale >= 4 ? 10000 : 10));
+        if (!fake_reserve(stmt, col, len + 1)) return 0;
+        memcpy(stmt->bufs[col], tmp, len + 1);
+        break;
+    case A_DATE:
+        len = (size_t)snprintf(tmp, sizeof(tmp), "%02d/%02d/%04d",
+                (int)(h % 12) + 1, (int)((h >> 8) % 28) + 1,
+                2000 + (int)((h >> 16) % 25));
+        if (!fake_reserve(stmt, col, len + 1)) return 0;
+        memcpy(stmt->bufs[col], tmp, len + 1);
+        break;
+    case A_TIME:
+        len = (size_t)snprintf(tmp, sizeof(tmp), "%02d:%02d:%02d",
+                (int)(h % 24), (int)((h >> 8) % 60), (int)((h >> 16) % 60));
+        if (!fake_reserve(stmt, col, len + 1)) return 0;
+        memcpy(stmt->bufs[col], tmp, len + 1);
+        break;
+    case A_TIMESTAMP:
+        len = (size_t)snprintf(tmp, sizeof(tmp),
+                "%02d/%02d/%04d %02d:%02d:%02d.%03d",
+                (int)(h % 12) + 1, (int)((h >> 8) % 28) + 1,
+                2000 + (int)((h >> 16) % 25), (int)((h >> 24) % 24),
+                (int)((h >> 32) % 60), (int)((h >> 40) % 60),
+                (int)((h >> 48) % 1000));
+        if (!fake_reserve(stmt, col, len + 1)) return 0;
+        memcpy(stmt->bufs[col], tmp, len + 1);
+        break;
+    case A_STRING:
+    case A_NCHAR: {
+        size_t max = c->size;
+        int wide = c->type == A_NCHAR;
+        if (wide)
+            max /= 2;
+        if (c->native_type == DT_LONGVARCHAR
+                || c->native_type == DT_LONGNVARCHAR)
+            max = (size_t)stmt->config.blob_size;
+        /* low cardinality text */
+        len = (size_t)snprintf(tmp, sizeof(tmp), "%s %lu",
+                fake_words[h % 8], (unsigned long)((h >> 8) % 16));
+        if (len > max)
+            len = max;
+        if (c->native_type == DT_LONGVARCHAR
+                || c->native_type == DT_LONGNVARCHAR)
+            len = max;
+        else if (c->native_type == DT_FIXCHAR || c->native_type == DT_NFIXCHAR)
+            len = max;
+        if (!fake_reserve(stmt, col, (len + 1) * 2)) return 0;
+        buf = stmt->bufs[col];
+        for (i = 0; i < len; i++) {
+            size_t n = strlen(tmp);
+            char ch = i < n ? tmp[i] : (c->native_type == DT_LONGVARCHAR
+                    || c->native_type == DT_LONGNVARCHAR ? tmp[i % n] : ' ');
+            if (wide) {
+                buf[2 * i] = ch;
+                buf[2 * i + 1] = 0;
+            } else {
+                buf[i] = ch;
+            }
+        }
+        if (wide)
+            len *= 2;
+        buf[len] = '\0';
+        break;
+    }
+    case A_BINARY: {
+        size_t n = c->native_type == DT_LONGBINARY
+            ? (size_t)stmt->config.blob_size : c->size;
+        if (!fake_reserve(stmt, col, n + 1)) return 0;
+        buf = stmt->bufs[col];
+        for (i = 0; i < n; i++)
+            buf[i] = (char)((h >> ((i % 8) * 8)) + i);
+        len = n;
+        break;
+    }
+    default:
+        len = 0;
+        if (!fake_reserve(stmt, col, 1)) return 0;
+        break;
+    }
+    stmt->lengths[col] = (unsigned int)len;
+    if (stmt->nulls[col])
+        stmt->lengths[col] = 0;
+    return 1;
+}
+
+int ads_fetch_next(struct a_ads_stmt *stmt)
+{
+    int i;
+    if (stmt == NULL || !stmt->executed || stmt->bufs == NULL)
+        return 0;
+    fake_sleep(stmt->config.fetch_latency);
+    if (stmt->row + 1 >= stmt->config.rows) {
+        stmt->row = stmt->config.rows;
+        return 0;
+    }
+    stmt->row++;
+    for (i = 0; i < stmt->config.ncols; i++) {
+        if (!fake_generate(stmt, i)) {
+            fake_set_error(stmt->conn, 7200, "[Fake ACE] Out of memory");
+            return 0;
+        }
+    }
+    return 1;
+}
+
+int ads_affected_rows(struct a_ads_stmt *stmt)
+{
+    const char *p;
+
+    if (stmt == NULL || !stmt->executed)
+        return -1;
+    if (stmt->has_result)
+        return -1;
+    p = stmt->sql;
+    while (isspace((unsigned char)*p))
+        p++;
+    return fake_strncaseeq(p, "set", 3) ? 0 : 1;
+}
+
+int ads_num_cols(struct a_ads_stmt *stmt)
+{
+    if (stmt == NULL)
+        return -1;
+    if (!stmt->has_result)
+        return 0;
+    return stmt->config.ncols;
+}
+
+int ads_num_rows(struct a_ads_stmt *stmt)
+{
+    if (stmt == NULL || !stmt->has_result)
+        return -1;
+    return (int)stmt->config.rows;
+}
+
+static int fake_valid_row(struct a_ads_stmt *stmt, unsigned int col_index)
+{
+    if (stmt == NULL || stmt->bufs == NULL)
+        return 0;
+    if (col_index >= (unsigned int)stmt->config.ncols) {
+        fake_set_error(stmt->conn, 7200, "[Fake ACE] Invalid column index");
+        return 0;
+    }
+    if (stmt->row < 0 || stmt->row >= stmt->config.rows) {
+        fake_set_error(stmt->conn, 7200, "[Fake ACE] No current row");
+        return 0;
+    }
+    return 1;
+}
+
+int ads_get_column(struct a_ads_stmt *stmt, unsigned int col_index,
+        struct a_ads_data_value *buffer)
+{
+    if (buffer == NULL || !fake_valid_row(stmt, col_index))
+        return 0;
+    buffer->buffer = stmt->bufs[col_index];
+    buffer->buffer_size = (unsigned int)stmt->bufsizes[col_index];
+    buffer->length = &stmt->lengths[col_index];
+    buffer->type = stmt->config.cols[col_index].type;
+    buffer->is_null = &stmt->nulls[col_index];
+    return 1;
+}
+
+int ads_get_data(struct a_ads_stmt *stmt, unsigned int col_index,
+        size_t offset, void *buffer, size_t size)
+{
+    size_t len;
+    if (buffer == NULL || !fake_valid_row(stmt, col_index))
+        return -1;
+    len = stmt->lengths[col_index];
+    if (offset >= len)
+        return 0;
+    if (size > len - offset)
+        size = len - offset;
+    memcpy(buffer, stmt->bufs[col_index] + offset, size);
+    return (int)size;
+}
+
+int ads_get_data_info(struct a_ads_stmt *stmt, unsigned int col_index,
+        struct a_ads_data_info *buffer)
+{
+    if (buffer == NULL || !fake_valid_row(stmt, col_index))
+        return 0;
+    buffer->type = stmt->config.cols[col_index].type;
+    buffer->is_null = stmt->nulls[col_index];
+    buffer->data_size = stmt->lengths[col_index];
+    return 1;
+}
+
+int ads_get_column_info(struct a_ads_stmt *stmt, unsigned int col_index,
+        struct a_ads_column_info *buffer)
+{
+    struct fake_column *c;
+    if (stmt == NULL || buffer == NULL
+            || col_index >= (unsigned int)stmt->config.ncols)
+        return 0;
+    c = &stmt->config.cols[col_index];
+    buffer->name = c->name;
+    buffer->type = c->type;
+    buffer->native_type = c->native_type;
+    buffer->precision = c->precision;
+    buffer->scale = c->scale;
+    buffer->max_size = c->size;
+    buffer->nullable = 1;
+    return 1;
+}
+
+static struct fake_conn *fake_lookup(uint64_t handle)
+{
+    struct fake_conn *conn;
+
+    if (handle == 0 || handle >= FAKE_MAX_CONNS)
+        return NULL;
+    pthread_mutex_lock(&fake_conns_lock);
+    conn = fake_conns[handle];
+    pthread_mutex_unlock(&fake_conns_lock);
+    return conn;
+}
+
+unsigned int AdsBeginTransaction(uint64_t handle)
+{
+    struct fake_conn *conn = fake_lookup(handle);
+    if (conn == NULL)
+        return 6303;
+    conn->trans_count++;
+    return 0;
+}
+
+unsigned int AdsInTransaction(uint64_t handle, unsigned short int *in_trans)
+{
+    struct fake_conn *conn = fake_lookup(handle);
+    if (conn == NULL)
+        return 6303;
+    *in_trans = conn->trans_count > 0;
+    return 0;
+}
+
+unsigned int AdsGetTransactionCount(uint64_t handle, unsigned int *count)
+{
+    struct fake_conn *conn = fake_lookup(handle);
+    if (conn == NULL)
+        return 6303;
+    *count = conn->trans_count;
+    return 0;
+}
@@ -1,10 +1,16 @@
 # Copyright (c) 2018 Marco Giusti
 
 from contextlib import closing
+import copy
 import decimal
 import datetime
 import gc
+import io
+import json
+import pickle
+import threading
 import unittest
+import warnings
 import weakref
 
 from hypothesis import given, settings
@@ -34,6 +40,19 @@ class TestToPython(unittest.TestCase):
             self.encoding
         )
 
+    def test_unknown_type(self):
+        value = self._new_data_value(99, b'', 0)
+        self.assertRaises(
+            adsdb3.OperationalError,
+            adsdb3._to_python,
+            value,
+            self.encoding
+        )
+
+    def test_null(self):
+        value = self._new_data_value(lib.A_VAL32, b'\0\0\0\0', 4, 1)
+        self.assertIsNone(adsdb3._to_python(value, self.encoding))
+
     def _new_data_value(self, typ, buf, length, is_null=0):
         value = ffi.new('struct a_ads_data_value *')
         _is_null = ffi.new('unsigned int *', is_null)
@@ -117,6 +136,28 @@ class TestToPython(unittest.TestCase):
         buf = b'18:10:00'
         self._test_type(lib.A_TIME, datetime.time(18, 10), buf, len(buf))
 
+    def test_decoder(self):
+        decode = adsdb3._decoder(lib.A_STRING, self.encoding)
+        buf = b'\xc7a peut pas faire de mal'
+        value = self._new_data_value(lib.A_STRING, buf, len(buf))
+        self.assertEqual(decode(value), 'Ça peut pas faire de mal')
+
+    def test_decoder_invalid_type(self):
+        decode = adsdb3._decoder(lib.A_INVALID_TYPE, self.encoding)
+        value = self._new_data_value(lib.A_INVALID_TYPE, b'', 0)
+        self.assertRaises(adsdb3.OperationalError, decode, value)
+
+    def test_converter(self):
+        convert = adsdb3._converter(lib.A_DATE, self.encoding)
+        self.assertEqual(convert(b'12/19/2015'), datetime.date(2015, 12, 19))
+        self.assertIsNone(adsdb3._converter(lib.A_BINARY, self.encoding))
+        self.assertRaises(
+            adsdb3.OperationalError,
+            adsdb3._converter,
+            lib.A_INVALID_TYPE,
+            self.encoding
+        )
+
     def test_datetime_type(self):
         buf = b'12/19/2015 18:10:00'
         self._test_type(
@@ -127,6 +168,91 @@ class TestToPython(unittest.TestCase):
         )
 
 
+class TestDateTime(unittest.TestCase):
+
+    def test_date(self):
+        self.assertEqual(
+            adsdb3._date('12/19/2015'),
+            datetime.date(2015, 12, 19)
+        )
+
+    def test_date_short_fields(self):
+        self.assertEqual(adsdb3._date('1/9/2015'), datetime.date(2015, 1, 9))
+
+    def test_date_empty(self):
+        self.assertIsNone(adsdb3._date(''))
+
+    def test_date_invalid(self):
+        self.assertRaises(ValueError, adsdb3._date, '13/19/2015')
+        self.assertRaises(ValueError, adsdb3._date, '2015-12-19')
+
+    def test_date_cached(self):
+        self.assertIs(adsdb3._date('12/20/2015'), adsdb3._date('12/20/2015'))
+
+    def test_time(self):
+        self.assertEqual(adsdb3._time('18:10:05'), datetime.time(18, 10, 5))
+
+    def test_time_fraction(self):
+        self.assertEqual(
+            adsdb3._time('18:10:05.57'),
+            datetime.time(18, 10, 5, 570000)
+        )
+        self.assertEqual(
+            adsdb3._time('18:10:05.1234567'),
+            datetime.time(18, 10, 5, 123456)
+        )
+
+    def test_time_am_pm(self):
+        self.assertEqual(adsdb3._time('06:10:05 PM'), datetime.time(18, 10, 5))
+        self.assertEqual(adsdb3._time('06:10:05 AM'), datetime.time(6, 10, 5))
+        self.assertEqual(adsdb3._time('12:10:05 AM'), datetime.time(0, 10, 5))
+        self.assertEqual(adsdb3._time('12:10:05 PM'), datetime.time(12, 10, 5))
+        self.assertEqual(
+            adsdb3._time('06:10:05.5 PM'),
+            datetime.time(18, 10, 5, 500000)
+        )
+
+    def test_time_fast_path(self):
+        for value in ('00:00:00', '23:59:59', '18:10:05.570', '12:10:05',
+                      '12:10:05.250', '1a:10:05', '18:10:05.12a'):
+            with self.subTest(value=value):
+                try:
+                    expected = datetime.time(*adsdb3._time_fields(value))
+                except adsdb3.OperationalError:
+                    self.assertRaises(
+                        adsdb3.OperationalError,
+                        adsdb3._time,
+                        value
+                    )
+                else:
+                    self.assertEqual(adsdb3._time(value), expected)
+
+    def test_time_empty(self):
+        self.assertIsNone(adsdb3._time(''))
+
+    def test_time_invalid(self):
+        for value in ('18:10', '18.10.05', '18:10:05.', '18:10:05 XM',
+                      '18:10:05.1a'):
+            with self.subTest(value=value):
+                self.assertRaises(
+                    adsdb3.OperationalError,
+                    adsdb3._time,
+                    value
+                )
+
+    def test_datetime(self):
+        self.assertEqual(
+            adsdb3._datetime('12/19/2015 06:10:05.25 PM'),
+            datetime.datetime(2015, 12, 19, 18, 10, 5, 250000)
+        )
+
+    def test_datetime_date_only(self):
+        self.assertEqual(
+            adsdb3._datetime('12/19/2015'),
+            datetime.date(2015, 12, 19)
+        )
+
+
 def is_int16(i):
     return -2**15 <= i <= 2**15 - 1
 
@@ -396,6 +522,23 @@ class TestWarnings(ConnectMixin, unittest.TestCase):
                     cursor.__next__()
                 self.assertIn('cursor.__next__', str(cm.warning))
 
+    def test_warn_once(self):
+        with closing(self.connect()) as connection:
+            with closing(connection.cursor()) as cursor:
+                with self.assertWarns(UserWarning):
+                    iter(cursor)
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')
+                    iter(cursor)
+
+    def test_warn_extensions(self):
+        with closing(self.connect()) as connection:
+            with closing(connection.cursor()) as cursor:
+                cursor.warn_extensions = False
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')
+                    iter(cursor)
+
 
 class TestTransactions(ConnectMixin, unittest.TestCase):
 
@@ -509,3 +652,800 @@ class TestAutocommit(DDLMixin, unittest.TestCase):
     def test_autocommit_explicit(self):
         # XXX: why?
         self._test_autocommit('EXPLICIT', 1)
+
+
+class _DummyStatement:
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.freed = False
+
+    def free(self):
+        self.freed = True
+
+
+class TestStatementCache(unittest.TestCase):
+
+    def test_miss(self):
+        cache = adsdb3._StatementCache(2)
+        self.assertIsNone(cache.get('SELECT 1'))
+        self.assertEqual(cache.info(), (0, 1, 2, 0))
+
+    def test_hit(self):
+        cache = adsdb3._StatementCache(2)
+        stmt = _DummyStatement('SELECT 1')
+        cache.put(stmt)
+        self.assertIs(cache.get('SELECT 1'), stmt)
+        self.assertEqual(cache.info(), (1, 0, 2, 0))
+
+    def test_checked_out_statement_is_not_shared(self):
+        cache = adsdb3._StatementCache(2)
+        cache.put(_DummyStatement('SELECT 1'))
+        cache.get('SELECT 1')
+        self.assertIsNone(cache.get('SELECT 1'))
+
+    def test_evict_least_recently_used(self):
+        cache = adsdb3._StatementCache(2)
+        stmt1 = _DummyStatement('SELECT 1')
+        stmt2 = _DummyStatement('SELECT 2')
+        stmt3 = _DummyStatement('SELECT 3')
+        cache.put(stmt1)
+        cache.put(stmt2)
+        cache.put(cache.get('SELECT 1'))
+        cache.put(stmt3)
+        self.assertTrue(stmt2.freed)
+        self.assertFalse(stmt1.freed)
+        self.assertFalse(stmt3.freed)
+        self.assertEqual(len(cache), 2)
+
+    def test_replace_same_operation(self):
+        cache = adsdb3._StatementCache(2)
+        stmt1 = _DummyStatement('SELECT 1')
+        stmt2 = _DummyStatement('SELECT 1')
+        cache.put(stmt1)
+        cache.put(stmt2)
+        self.assertTrue(stmt1.freed)
+        self.assertIs(cache.get('SELECT 1'), stmt2)
+
+    def test_resize(self):
+        cache = adsdb3._StatementCache(2)
+        stmt1 = _DummyStatement('SELECT 1')
+        stmt2 = _DummyStatement('SELECT 2')
+        cache.put(stmt1)
+        cache.put(stmt2)
+        cache.resize(1)
+        self.assertTrue(stmt1.freed)
+        self.assertFalse(stmt2.freed)
+
+    def test_disabled(self):
+        cache = adsdb3._StatementCache(0)
+        stmt = _DummyStatement('SELECT 1')
+        cache.put(stmt)
+        self.assertTrue(stmt.freed)
+        self.assertEqual(len(cache), 0)
+
+    def test_clear(self):
+        cache = adsdb3._StatementCache(2)
+        stmt = _DummyStatement('SELECT 1')
+        cache.put(stmt)
+        cache.clear()
+        self.assertTrue(stmt.freed)
+        self.assertEqual(len(cache), 0)
+
+
+class TestConnectionStatementCache(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_reuse_statement(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            info = connection.statement_cache_info()
+            cursor.execute(self.query)
+            self.assertEqual(
+                connection.statement_cache_info().hits,
+                info.hits + 1
+            )
+            self.assertIsNotNone(cursor.fetchone())
+
+    def test_description_is_kept(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            description = cursor.description
+            cursor.execute(self.query)
+            self.assertEqual(cursor.description, description)
+
+    def test_close_clears_cache(self):
+        connection = adsdb3.connect(*self.connect_args, **self.connect_kw_args)
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+        self.assertGreater(connection.statement_cache_info().currsize, 0)
+        connection.close()
+        self.assertEqual(connection.statement_cache_info().currsize, 0)
+
+    def test_cache_size(self):
+        connection = self.connect()
+        connection.statement_cache_size = 0
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+        self.assertEqual(connection.statement_cache_info().currsize, 0)
+
+
+class TestExecutemany(DDLMixin, unittest.TestCase):
+
+    ddl = '''
+        CREATE TABLE {prefix}booze (
+            name VARCHAR(30),
+            qty INTEGER
+        )
+    '''
+    xddl = 'DROP TABLE {prefix}booze'
+
+    def test_prepare_once(self):
+        stmt = 'INSERT INTO {prefix}booze VALUES(?, ?)'.format(
+            prefix=self.prefix
+        )
+        info = self.connection.statement_cache_info()
+        with transaction(self.connection) as cursor:
+            cursor.executemany(stmt, [('grappa', 1), ('rum', 2), ('gin', 3)])
+            self.assertEqual(cursor.rowcount, 3)
+        self.assertEqual(
+            self.connection.statement_cache_info().misses,
+            info.misses + 1
+        )
+
+    def test_rebind_different_types(self):
+        stmt = 'INSERT INTO {prefix}booze VALUES(?, ?)'.format(
+            prefix=self.prefix
+        )
+        with transaction(self.connection) as cursor:
+            cursor.executemany(stmt, [('grappa', 1), ('rum', '2'), (None, 3)])
+            self.assertEqual(cursor.rowcount, 3)
+
+    def test_grow_bind_buffers(self):
+        stmt = 'INSERT INTO {prefix}booze VALUES(?, ?)'.format(
+            prefix=self.prefix
+        )
+        with transaction(self.connection) as cursor:
+            cursor.executemany(stmt, [('g' * i, i) for i in (1, 30, 2)])
+            self.assertEqual(cursor.rowcount, 3)
+
+    def test_empty_sequence(self):
+        stmt = 'INSERT INTO {prefix}booze VALUES(?, ?)'.format(
+            prefix=self.prefix
+        )
+        with transaction(self.connection) as cursor:
+            cursor.executemany(stmt, [])
+            self.assertEqual(cursor.rowcount, -1)
+
+
+class TestBulkInsert(DDLMixin, unittest.TestCase):
+
+    ddl = '''
+        CREATE TABLE {prefix}booze (
+            name VARCHAR(30),
+            qty INTEGER
+        )
+    '''
+    xddl = 'DROP TABLE {prefix}booze'
+
+    def setUp(self):
+        super().setUp()
+        self.table = '{prefix}booze'.format(prefix=self.prefix)
+
+    def count(self):
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute('SELECT COUNT(*) FROM ' + self.table)
+            return cursor.fetchone()[0]
+
+    def test_generator(self):
+        rows = (('booze{}'.format(i), i) for i in range(25))
+        with closing(self.connection.cursor()) as cursor:
+            stats = cursor.bulk_insert(
+                self.table,
+                ['name', 'qty'],
+                rows,
+                batch_size=10,
+                commit_every=10
+            )
+            self.assertEqual(cursor.rowcount, 25)
+        self.assertEqual(stats.rows, 25)
+        self.assertEqual(stats.commits, 3)
+        self.assertGreaterEqual(stats.rate, 0)
+        self.connection.rollback()
+        self.assertEqual(self.count(), 25)
+
+    def test_no_commit(self):
+        with closing(self.connection.cursor()) as cursor:
+            stats = cursor.bulk_insert(self.table, ['qty'], [(1, ), (2, )])
+        self.assertEqual(stats.commits, 0)
+        self.connection.rollback()
+        self.assertEqual(self.count(), 0)
+
+    def test_error_keeps_committed_rows(self):
+        rows = [('grappa', 1), ('rum', 2), ('gin', 3), ('vodka', )]
+        with closing(self.connection.cursor()) as cursor:
+            self.assertRaises(
+                adsdb3.ProgrammingError,
+                cursor.bulk_insert,
+                self.table,
+                ['name', 'qty'],
+                rows,
+                commit_every=2
+            )
+            self.assertEqual(cursor.rowcount, 3)
+        # the rows after the last commit are rolled back
+        self.connection.commit()
+        self.assertEqual(self.count(), 2)
+
+    def test_wrong_number_of_values(self):
+        with closing(self.connection.cursor()) as cursor:
+            self.assertRaises(
+                adsdb3.ProgrammingError,
+                cursor.bulk_insert,
+                self.table,
+                ['name', 'qty'],
+                [('grappa', )]
+            )
+
+    def test_invalid_identifier(self):
+        with closing(self.connection.cursor()) as cursor:
+            for table, columns in [
+                ('booze; DROP TABLE booze', ['qty']),
+                (self.table, ['qty) VALUES (1); --']),
+            ]:
+                self.assertRaises(
+                    adsdb3.ProgrammingError,
+                    cursor.bulk_insert,
+                    table,
+                    columns,
+                    [(1, )]
+                )
+
+    def test_invalid_batch_size(self):
+        with closing(self.connection.cursor()) as cursor:
+            self.assertRaises(
+                ValueError,
+                cursor.bulk_insert,
+                self.table,
+                ['qty'],
+                [],
+                batch_size=0
+            )
+
+
+class TestLongValue(DDLMixin, unittest.TestCase):
+
+    ddl = '''
+        CREATE TABLE {prefix}booze (
+            id INTEGER,
+            label MEMO,
+            picture BLOB
+        )
+    '''
+    xddl = 'DROP TABLE {prefix}booze'
+
+    label = 'Grappa di Nebbiolo ' * 100
+    picture = bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        with transaction(self.connection) as cursor:
+            cursor.execute(
+                'INSERT INTO {prefix}booze VALUES(?, ?, ?)'.format(
+                    prefix=self.prefix
+                ),
+                (1, self.label, self.picture)
+            )
+        self.cursor = self.connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.stream_threshold = 1024
+        self.query = 'SELECT * FROM {prefix}booze'.format(prefix=self.prefix)
+
+    def test_stream(self):
+        self.cursor.execute(self.query)
+        id, label, picture = self.cursor.fetchone()
+        self.assertEqual(id, 1)
+        self.assertIsInstance(picture, adsdb3.LongValue)
+        self.assertEqual(len(picture), len(self.picture))
+        self.assertIsNone(picture.encoding)
+        chunks = iter(lambda: picture.read(1000), b'')
+        self.assertEqual(b''.join(chunks), self.picture)
+        text = io.TextIOWrapper(label, label.encoding)
+        self.assertEqual(text.read(), self.label)
+
+    def test_seek(self):
+        self.cursor.execute(self.query)
+        picture = self.cursor.fetchone()[2]
+        picture.seek(-10, io.SEEK_END)
+        self.assertEqual(picture.read(), self.picture[-10:])
+
+    def test_small_value(self):
+        self.cursor.stream_threshold = len(self.picture)
+        self.cursor.execute(self.query)
+        self.assertEqual(self.cursor.fetchone()[2], self.picture)
+
+    def test_moved(self):
+        self.cursor.execute(self.query)
+        picture = self.cursor.fetchone()[2]
+        self.cursor.fetchone()
+        self.assertRaises(adsdb3.InterfaceError, picture.read)
+
+
+class TestBinaryViews(DDLMixin, unittest.TestCase):
+
+    ddl = '''
+        CREATE TABLE {prefix}booze (
+            id INTEGER,
+            picture BLOB
+        )
+    '''
+    xddl = 'DROP TABLE {prefix}booze'
+
+    pictures = [bytes(range(256)) * 4, None, b'label']
+
+    def setUp(self):
+        super().setUp()
+        with transaction(self.connection) as cursor:
+            cursor.executemany(
+                'INSERT INTO {prefix}booze VALUES(?, ?)'.format(
+                    prefix=self.prefix
+                ),
+                list(enumerate(self.pictures))
+            )
+        self.cursor = self.connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.binary_views = True
+        self.query = 'SELECT picture FROM {prefix}booze ORDER BY id'.format(
+            prefix=self.prefix
+        )
+
+    def test_fetchall(self):
+        self.cursor.execute(self.query)
+        pictures = [row[0] for row in self.cursor.fetchall()]
+        self.assertIsInstance(pictures[0], memoryview)
+        self.assertEqual(pictures, self.pictures)
+
+    def test_fetchone(self):
+        self.cursor.execute(self.query)
+        picture = self.cursor.fetchone()[0]
+        self.assertIsInstance(picture, memoryview)
+        self.cursor.fetchall()
+        # still valid after the cursor moved
+        self.assertEqual(picture, self.pictures[0])
+
+
+class TestFetchColumns(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def _rows_and_columns(self, size=None):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+            cursor.execute(self.query)
+            columns, nulls = cursor.fetch_columns(size)
+        return rows, columns, nulls
+
+    def test_same_values(self):
+        rows, columns, nulls = self._rows_and_columns()
+        self.assertEqual(len(columns), len(rows[0]))
+        for column, mask, values in zip(columns, nulls, zip(*rows)):
+            self.assertEqual(len(column), len(values))
+            for value, null, expected in zip(column, mask, values):
+                self.assertEqual(bool(null), expected is None)
+                if expected is not None:
+                    self.assertEqual(value, expected)
+
+    def test_size(self):
+        rows, columns, nulls = self._rows_and_columns(1)
+        self.assertTrue(all(len(column) == 1 for column in columns))
+        self.assertTrue(all(len(mask) == 1 for mask in nulls))
+
+    def test_no_results(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            self.assertRaises(adsdb3.InterfaceError, cursor.fetch_columns)
+
+
+class TestSharedConnection(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_threadsafety(self):
+        self.assertEqual(adsdb3.threadsafety, 2)
+
+    def test_cursors_in_threads(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            expected = cursor.fetchall()
+        results = []
+        errors = []
+
+        def run():
+            try:
+                with closing(connection.cursor()) as cursor:
+                    for i in range(20):
+                        cursor.execute(self.query)
+                        results.append(cursor.fetchall())
+                        connection.rollback()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=run) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 160)
+        for result in results:
+            self.assertEqual(result, expected)
+
+
+class TestRow(unittest.TestCase):
+
+    def setUp(self):
+        convert_date = adsdb3._converter(lib.A_DATE, 'ascii')
+        layout = adsdb3._RowLayout(
+            ['id', 'day', 'id'],
+            (None, convert_date, None)
+        )
+        self.row = adsdb3.Row(layout, (1, b'12/19/2015', 2))
+
+    def test_access(self):
+        date = datetime.date(2015, 12, 19)
+        self.assertEqual(self.row[1], date)
+        self.assertEqual(self.row['day'], date)
+        self.assertEqual(self.row.day, date)
+        self.assertEqual(self.row[-1], 2)
+        self.assertEqual(self.row[:2], (1, date))
+
+    def test_duplicate_name(self):
+        self.assertEqual(self.row['id'], 1)
+
+    def test_missing(self):
+        self.assertRaises(KeyError, self.row.__getitem__, 'missing')
+        self.assertRaises(AttributeError, getattr, self.row, 'missing')
+        self.assertRaises(IndexError, self.row.__getitem__, 3)
+
+    def test_sequence(self):
+        date = datetime.date(2015, 12, 19)
+        self.assertEqual(len(self.row), 3)
+        self.assertEqual(tuple(self.row), (1, date, 2))
+        self.assertEqual(self.row, (1, date, 2))
+        self.assertEqual(self.row.keys(), ('id', 'day', 'id'))
+
+    def test_copy(self):
+        row = copy.copy(self.row)
+        self.assertEqual(row, self.row)
+        self.assertEqual(row.day, self.row.day)
+
+    def test_pickle(self):
+        row = pickle.loads(pickle.dumps(self.row))
+        self.assertIsInstance(row, adsdb3.Row)
+        self.assertEqual(row, self.row)
+        self.assertEqual(row.day, datetime.date(2015, 12, 19))
+        self.assertEqual(row.keys(), self.row.keys())
+
+
+class TestLazyRows(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_same_values(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+            cursor.lazy_rows = True
+            cursor.execute(self.query)
+            lazy = cursor.fetchall()
+            cursor.execute(self.query)
+            first = cursor.fetchone()
+            names = [d[0] for d in cursor.description]
+        self.assertTrue(all(isinstance(row, adsdb3.Row) for row in lazy))
+        self.assertEqual(lazy, rows)
+        self.assertEqual(first, rows[0])
+        self.assertEqual([first[name] for name in names], list(rows[0]))
+
+
+class TestInterner(unittest.TestCase):
+
+    def setUp(self):
+        self.interner = adsdb3._Interner(bytes.decode)
+
+    def test_shared(self):
+        values = self.interner.convert_all([b'abc', b'abc', b'de'])
+        self.assertEqual(values, ['abc', 'abc', 'de'])
+        self.assertIs(values[0], values[1])
+
+    def test_bounded(self):
+        self.interner.convert_all([b'a'] * adsdb3._INTERN_SAMPLE)
+        values = [str(i).encode() for i in range(adsdb3._INTERN_SIZE * 2)]
+        self.interner.convert_all(values)
+        self.assertTrue(self.interner.enabled)
+        self.assertEqual(len(self.interner.cache), adsdb3._INTERN_SIZE)
+
+    def test_disable(self):
+        values = [str(i).encode() for i in range(adsdb3._INTERN_SAMPLE)]
+        self.assertEqual(
+            self.interner.convert_all(values),
+            [value.decode() for value in values]
+        )
+        self.assertFalse(self.interner.enabled)
+        self.assertEqual(self.interner.cache, {})
+        self.assertEqual(self.interner.convert_all([b'a']), ['a'])
+
+    def test_keep_enabled(self):
+        self.interner.convert_all([b'a', b'b'] * adsdb3._INTERN_SAMPLE)
+        self.assertTrue(self.interner.enabled)
+
+
+class TestInternStrings(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_same_values(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+            cursor.intern_strings = True
+            cursor.execute(self.query)
+            self.assertEqual(cursor.fetchall(), rows)
+            cursor.execute(self.query)
+            self.assertEqual(list(cursor), rows)
+
+
+class TestFormatColumn(unittest.TestCase):
+
+    def test_csv(self):
+        self.assertEqual(
+            adsdb3._format_column(
+                [None, datetime.date(2018, 1, 2)],
+                adsdb3._CSV_FORMATS
+            ),
+            [None, '2018-01-02']
+        )
+        self.assertEqual(
+            adsdb3._format_column([b'\x00\xff', None], adsdb3._CSV_FORMATS),
+            ['AP8=', None]
+        )
+        values = [1, None]
+        self.assertIs(
+            adsdb3._format_column(values, adsdb3._CSV_FORMATS),
+            values
+        )
+
+    def test_json(self):
+        def format(values):
+            return adsdb3._format_column(
+                values,
+                adsdb3._JSON_FORMATS,
+                adsdb3._json_encode
+            )
+
+        self.assertEqual(
+            format([decimal.Decimal('1.10'), None]),
+            ['1.10', 'null']
+        )
+        self.assertEqual(format(['caf\xe9', '"']), ['"caf\xe9"', '"\\""'])
+        self.assertEqual(
+            format([datetime.datetime(2018, 1, 2, 3, 4, 5)]),
+            ['"2018-01-02T03:04:05"']
+        )
+        self.assertEqual(format([None, None]), ['null', 'null'])
+        self.assertEqual(
+            format([float('nan'), float('inf'), -1.5]),
+            ['null', 'null', '-1.5']
+        )
+
+    def test_mixed_types(self):
+        # a TIMESTAMP without the time is a date
+        values = [
+            datetime.datetime(2018, 1, 2, 3, 4, 5),
+            None,
+            datetime.date(2018, 1, 3)
+        ]
+        self.assertEqual(
+            adsdb3._format_column(values, adsdb3._CSV_FORMATS),
+            ['2018-01-02T03:04:05', None, '2018-01-03']
+        )
+        self.assertEqual(
+            adsdb3._format_column(
+                values,
+                adsdb3._JSON_FORMATS,
+                adsdb3._json_encode
+            ),
+            ['"2018-01-02T03:04:05"', 'null', '"2018-01-03"']
+        )
+        self.assertEqual(
+            adsdb3._format_column([1, b'\x00'], adsdb3._CSV_FORMATS),
+            [1, 'AA==']
+        )
+
+
+class TestExport(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def setUp(self):
+        super().setUp()
+        connection = self.connect()
+        self.cursor = connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.execute(self.query)
+        self.rows = self.cursor.fetchall()
+        self.names = [d[0] for d in self.cursor.description]
+        self.cursor.execute(self.query)
+
+    def test_csv(self):
+        fileobj = io.StringIO(newline='')
+        self.assertEqual(
+            self.cursor.export_csv(fileobj, lineterminator='\n'),
+            len(self.rows)
+        )
+        lines = fileobj.getvalue().splitlines()
+        self.assertEqual(lines[0], ','.join(self.names))
+        self.assertEqual(len(lines), len(self.rows) + 1)
+        self.assertIsNone(self.cursor.fetchone())
+
+    def test_jsonl(self):
+        fileobj = io.StringIO()
+        self.assertEqual(self.cursor.export_jsonl(fileobj), len(self.rows))
+        lines = fileobj.getvalue().splitlines()
+        objects = [json.loads(line) for line in lines]
+        self.assertEqual(len(objects), len(self.rows))
+        for obj, row in zip(objects, self.rows):
+            self.assertEqual(list(obj), self.names)
+            for value, expected in zip(obj.values(), row):
+                if isinstance(expected, str) or expected is None:
+                    self.assertEqual(value, expected)
+
+
+class TestProjection(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def setUp(self):
+        super().setUp()
+        self.connection = connection = self.connect()
+        self.cursor = connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.execute(self.query)
+        self.description = self.cursor.description
+        self.rows = self.cursor.fetchall()
+        if len(self.description) < 2:
+            self.skipTest('the result set has a single column')
+
+    def test_projection(self):
+        name = self.description[1][0]
+        self.cursor.set_projection([name.lower(), 0])
+        self.cursor.execute(self.query)
+        self.assertEqual(
+            self.cursor.description,
+            (self.description[1], self.description[0])
+        )
+        self.assertEqual(
+            self.cursor.fetchall(),
+            [(row[1], row[0]) for row in self.rows]
+        )
+
+    def test_current_result_set(self):
+        self.cursor.execute(self.query)
+        self.cursor.set_projection([1])
+        self.assertEqual(self.cursor.fetchone(), (self.rows[0][1], ))
+        self.cursor.set_projection(None)
+        self.cursor.execute(self.query)
+        self.assertEqual(self.cursor.description, self.description)
+        self.assertEqual(self.cursor.fetchall(), self.rows)
+
+    def test_unknown_column(self):
+        self.cursor.execute(self.query)
+        self.assertRaises(
+            adsdb3.ProgrammingError,
+            self.cursor.set_projection,
+            ['adsdb3_no_such_column']
+        )
+
+    def test_unknown_column_on_execute(self):
+        self.cursor.execute('SET TRANSACTION AUTOCOMMIT_OFF')
+        self.cursor.set_projection([len(self.description)])
+        self.assertRaises(
+            adsdb3.ProgrammingError,
+            self.cursor.execute,
+            self.query
+        )
+
+    def test_cached_statement(self):
+        self.cursor.set_projection([0])
+        self.cursor.execute(self.query)
+        self.cursor.close()
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            self.assertEqual(cursor.description, self.description)
+
+
+@unittest.skipIf(adsdb3.numpy is None, 'numpy is not installed')
+class TestFetchNumpy(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_same_values(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+            description = cursor.description
+            cursor.execute(self.query)
+            arrays = cursor.fetchnumpy()
+        self.assertEqual(list(arrays), [d[0] for d in description])
+        for array, values in zip(arrays.values(), zip(*rows)):
+            self.assertEqual(len(array), len(values))
+            mask = adsdb3.numpy.ma.getmaskarray(array)
+            for value, null, expected in zip(array.data, mask, values):
+                self.assertEqual(null, expected is None)
+                if expected is None:
+                    continue
+                if isinstance(expected, datetime.date):
+                    value = value.astype(type(expected))
+                self.assertEqual(value, expected)
+
+    def test_batches(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            n = len(cursor.fetchall())
+            cursor.execute(self.query)
+            batches = list(cursor.fetch_numpy_batches(1))
+        self.assertEqual(len(batches), n)
+        for batch in batches:
+            for array in batch.values():
+                self.assertEqual(len(array), 1)
+
+
+@unittest.skipIf(adsdb3.pyarrow is None, 'pyarrow is not installed')
+class TestFetchArrow(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def test_same_values(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+            description = cursor.description
+            cursor.execute(self.query)
+            batches = list(cursor.fetch_arrow_batches(1000))
+        self.assertEqual(len(batches), 1)
+        batch = batches[0]
+        self.assertEqual(batch.schema.names, [d[0] for d in description])
+        self.assertEqual(
+            [tuple(row.values()) for row in batch.to_pylist()],
+            rows
+        )
+
+    def test_batch_size(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            n = len(cursor.fetchall())
+            cursor.execute(self.query)
+            batches = list(cursor.fetch_arrow_batches(1))
+        self.assertEqual(len(batches), n)
+        self.assertTrue(all(batch.num_rows == 1 for batch in batches))
+
+    def test_dictionary_encode(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            description = cursor.description
+            batch = next(cursor.fetch_arrow_batches(10, True))
+        for d, field in zip(description, batch.schema):
+            if d[1] == lib.DT_FIXCHAR:
+                self.assertTrue(adsdb3.pyarrow.types.is_dictionary(field.type))
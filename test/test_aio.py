@@ -0,0 +1,133 @@
+# Copyright (c) 2018 Marco Giusti
+
+import asyncio
+from contextlib import closing
+import unittest
+
+import adsdb3
+from adsdb3 import aio
+from adsdb3.pool import PoolTimeout
+from adsdb3_test_utils import ConnectMixin
+
+
+class AsyncMixin(ConnectMixin):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def aconnect(self):
+        return aio.connect(*self.connect_args, **self.connect_kw_args)
+
+    def expected_rows(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(self.query)
+            return cursor.fetchall()
+
+
+class TestAsyncConnection(AsyncMixin, unittest.TestCase):
+
+    def test_fetch(self):
+        expected = self.expected_rows()
+
+        async def fetch():
+            async with await self.aconnect() as connection:
+                cursor = connection.cursor()
+                await cursor.execute(self.query)
+                self.assertIsNotNone(cursor.description)
+                rows = await cursor.fetchall()
+                await cursor.execute(self.query)
+                row = await cursor.fetchone()
+                many = await cursor.fetchmany(len(expected))
+                await cursor.close()
+                await connection.commit()
+                return rows, [row] + many
+
+        rows, rows2 = self.run_async(fetch())
+        self.assertEqual(rows, expected)
+        self.assertEqual(rows2, expected)
+
+    def test_aiter(self):
+        expected = self.expected_rows()
+
+        async def fetch():
+            async with await self.aconnect() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(self.query)
+                    rows = []
+                    async for row in cursor:
+                        rows.append(row)
+                    return rows
+
+        self.assertEqual(self.run_async(fetch()), expected)
+
+    def test_closed(self):
+
+        async def close():
+            connection = await self.aconnect()
+            await connection.close()
+            await connection.close()
+            self.assertTrue(connection.closed)
+            with self.assertRaises(adsdb3.InterfaceError):
+                await connection.commit()
+
+        self.run_async(close())
+
+    def test_cancel(self):
+        expected = self.expected_rows()
+
+        async def cancel():
+            async with await self.aconnect() as connection:
+                cursor = connection.cursor()
+                task = asyncio.ensure_future(cursor.execute(self.query))
+                await asyncio.sleep(0)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                # the result set of the cancelled call is discarded
+                await connection.run(lambda: None)
+                self.assertIsNone(cursor.description)
+                self.assertIsNone(cursor._cursor._stmt)
+                await cursor.execute(self.query)
+                rows = await cursor.fetchall()
+                await cursor.close()
+                return rows
+
+        self.assertEqual(self.run_async(cancel()), expected)
+
+
+class TestAsyncPool(AsyncMixin, unittest.TestCase):
+
+    def test_reuse(self):
+
+        async def reuse():
+            pool = await aio.create_pool(self.aconnect, minsize=1, maxsize=1)
+            async with pool:
+                async with pool.connection() as connection:
+                    pass
+                async with pool.connection() as connection2:
+                    self.assertIs(connection, connection2)
+                    with self.assertRaises(PoolTimeout):
+                        await pool.acquire(0.01)
+            self.assertTrue(connection.closed)
+
+        self.run_async(reuse())
+
+    def test_closed(self):
+
+        async def closed():
+            pool = aio.AsyncPool(self.aconnect, check=None)
+            await pool.close()
+            with self.assertRaises(adsdb3.InterfaceError):
+                await pool.acquire()
+
+        self.run_async(closed())
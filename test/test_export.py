@@ -0,0 +1,73 @@
+# Copyright (c) 2018 Marco Giusti
+
+from contextlib import closing
+import io
+import unittest
+
+import adsdb3
+from adsdb3 import export
+from adsdb3_test_utils import ConnectMixin
+
+
+@unittest.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+class TestExport(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def setUp(self):
+        super().setUp()
+        self.connection = self.connect()
+        self.cursor = self.connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.execute(self.query)
+        self.rows = self.cursor.fetchall()
+        self.names = [d[0] for d in self.cursor.description]
+        self.cursor.execute(self.query)
+
+    def check_table(self, table):
+        self.assertEqual(table.schema.names, self.names)
+        self.assertEqual(
+            [tuple(row.values()) for row in table.to_pylist()],
+            self.rows
+        )
+
+    def check_stats(self, stats):
+        self.assertEqual(stats.rows, len(self.rows))
+        self.assertEqual([c.name for c in stats.columns], self.names)
+
+    def test_parquet(self):
+        fileobj = io.BytesIO()
+        stats = export.to_parquet(self.cursor, fileobj, row_group_size=1)
+        self.check_stats(stats)
+        self.assertEqual(stats.batches, len(self.rows))
+        for column in stats.columns:
+            self.assertGreater(column.uncompressed_size, 0)
+            self.assertTrue(column.encodings)
+        fileobj.seek(0)
+        self.check_table(export.pyarrow.parquet.read_table(fileobj))
+
+    def test_arrow_ipc(self):
+        fileobj = io.BytesIO()
+        stats = export.to_arrow_ipc(self.cursor, fileobj)
+        self.check_stats(stats)
+        self.assertEqual(stats.batches, 1)
+        fileobj.seek(0)
+        self.check_table(export.pyarrow.ipc.open_file(fileobj).read_all())
+
+    def test_empty_result_set(self):
+        self.cursor.fetchall()
+        fileobj = io.BytesIO()
+        stats = export.to_arrow_ipc(self.cursor, fileobj)
+        self.assertEqual(stats.rows, 0)
+        fileobj.seek(0)
+        table = export.pyarrow.ipc.open_file(fileobj).read_all()
+        self.assertEqual(table.schema.names, self.names)
+
+    def test_no_result_set(self):
+        with closing(self.connection.cursor()) as cursor:
+            self.assertRaises(
+                adsdb3.InterfaceError,
+                export.to_parquet,
+                cursor,
+                io.BytesIO()
+            )
@@ -0,0 +1,381 @@
+# Copyright (c) 2018 Marco Giusti
+
+'''
+Tests of the driver against the stand-in ACE library in test/fakeace,
+they run when ADSDB3_FAKEACE is set and _ace is linked against it.
+'''
+
+from contextlib import closing
+import datetime
+import decimal
+import io
+import os
+import threading
+import time
+import unittest
+
+import adsdb3
+from adsdb3 import export
+
+
+ALL_TYPES = (
+    'integer,short,bigint,autoinc,logical,double,numeric(10,2),money,'
+    'char(4),varchar(20),memo,nchar(4),nvarchar(10),nmemo,raw(8),blob,'
+    'date,time,timestamp'
+)
+
+
+def select(rows, columns=ALL_TYPES, nulls=0.2):
+    return 'SELECT /*fake rows={} nulls={} columns={}*/ * FROM t'.format(
+        rows, nulls, columns
+    )
+
+
+@unittest.skipIf(os.environ.get('ADSDB3_FAKEACE') is None,
+                 '_ace is not linked against the stand-in library')
+class FakeAceMixin:
+
+    def connect(self, connection_string='DataSource=fake'):
+        connection = adsdb3.connect(connection_string)
+        self.addCleanup(connection.close)
+        return connection
+
+    def execute(self, operation, parameters=(), connection=None):
+        if connection is None:
+            connection = self.connect()
+        cursor = connection.cursor()
+        self.addCleanup(cursor.close)
+        cursor.execute(operation, parameters)
+        return cursor
+
+
+class TestFakeAce(FakeAceMixin, unittest.TestCase):
+
+    def test_shape(self):
+        cursor = self.execute(
+            'SELECT /*fake rows=25 columns=integer,nvarchar(5),numeric(8,2),'
+            'timestamp,raw(4)*/ * FROM t'
+        )
+        self.assertEqual(cursor.rowcount, 25)
+        self.assertEqual(
+            [d[0] for d in cursor.description],
+            ['col1', 'col2', 'col3', 'col4', 'col5']
+        )
+        rows = cursor.fetchall()
+        self.assertEqual(len(rows), 25)
+        types = [int, str, decimal.Decimal, datetime.datetime, bytes]
+        for row in rows:
+            self.assertEqual([type(value) for value in row], types)
+
+    def test_connection_options(self):
+        connection = self.connect('DataSource=fake;FakeRows=3')
+        cursor = self.execute('SELECT * FROM t', connection=connection)
+        self.assertEqual(len(cursor.fetchall()), 3)
+
+    def test_same_rows(self):
+        operation = 'SELECT /*fake rows=50 columns=double,date*/ * FROM t'
+        self.assertEqual(
+            self.execute(operation).fetchall(),
+            self.execute(operation).fetchall()
+        )
+
+    def test_nulls(self):
+        cursor = self.execute(
+            'SELECT /*fake rows=1000 nulls=0.5 columns=integer*/ * FROM t'
+        )
+        nulls = sum(row[0] is None for row in cursor.fetchall())
+        self.assertTrue(400 < nulls < 600, nulls)
+
+    def test_echo(self):
+        parameters = (1, 'ciao', b'\x00\x01', 1.5, None)
+        cursor = self.execute(
+            'SELECT /*fake echo*/ ?, ?, ?, ?, ? FROM t',
+            parameters
+        )
+        self.assertEqual(cursor.fetchall(), [parameters])
+
+    def test_cached_parameters(self):
+        operation = 'SELECT /*fake echo*/ ?, ? FROM t'
+        cursor = self.execute(operation, (1, 'secret'))
+        self.assertEqual(cursor.fetchall(), [(1, 'secret')])
+        for parameters in [(2, ), (2, 'secret', 3)]:
+            with self.subTest(parameters=parameters):
+                self.assertRaises(
+                    adsdb3.ProgrammingError,
+                    cursor.execute,
+                    operation,
+                    parameters
+                )
+        self.assertRaises(
+            adsdb3.ProgrammingError,
+            cursor.executemany,
+            operation,
+            [(2, 'ciao'), (3, )]
+        )
+        cursor.execute(operation, (2, 'ciao'))
+        self.assertEqual(cursor.fetchall(), [(2, 'ciao')])
+
+    def test_long_values(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.stream_threshold = 10
+            cursor.execute(
+                'SELECT /*fake rows=2 blobsize=100 columns=blob*/ * FROM t'
+            )
+            value = cursor.fetchone()[0]
+            self.assertIsInstance(value, adsdb3.LongValue)
+            self.assertEqual(len(value.read()), 100)
+
+    def test_long_values_fetchall(self):
+        operation = 'SELECT /*fake rows=5 blobsize=100 ' \
+            'columns=integer,blob,memo,nmemo*/ * FROM t'
+        expected = self.execute(operation).fetchall()
+        for lazy_rows in (False, True):
+            with self.subTest(lazy_rows=lazy_rows):
+                cursor = self.execute(operation)
+                cursor.stream_threshold = 10
+                cursor.lazy_rows = lazy_rows
+                self.assertIsInstance(cursor.fetchone()[1], adsdb3.LongValue)
+                rows = cursor.fetchmany(2) + cursor.fetchall()
+                self.assertEqual(rows, expected[1:])
+
+    def test_long_text(self):
+        operation = 'SELECT /*fake rows=2 nulls=0 blobsize=100 ' \
+            'columns=nmemo*/ * FROM t'
+        expected = self.execute(operation).fetchone()[0]
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            cursor.stream_threshold = 10
+            cursor.execute(operation)
+            value = cursor.fetchone()[0]
+            self.assertEqual(value.encoding, 'utf-16-le')
+            self.assertEqual(len(value), 200)
+            text = io.TextIOWrapper(value, value.encoding).read()
+        self.assertEqual(text, expected)
+
+    def test_errors(self):
+        connection = self.connect()
+        with closing(connection.cursor()) as cursor:
+            self.assertRaises(
+                adsdb3.DatabaseError,
+                cursor.execute,
+                'SELECT syntax error FROM t'
+            )
+            self.assertRaises(
+                adsdb3.DatabaseError,
+                cursor.execute,
+                'SELECT * FROM raise error'
+            )
+
+    def test_latency(self):
+        cursor = self.connect().cursor()
+        self.addCleanup(cursor.close)
+        start = time.perf_counter()
+        cursor.execute('SELECT /*fake latency=20000 fetchlatency=1000*/ '
+                       '* FROM t')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.02)
+        start = time.perf_counter()
+        cursor.fetchall()
+        # 10 rows
+        self.assertGreaterEqual(time.perf_counter() - start, 0.01)
+
+    def test_intern_strings(self):
+        operation = 'SELECT /*fake rows=200 columns=integer,nchar(4),' \
+            'varchar(20)*/ * FROM t'
+        expected = self.execute(operation).fetchall()
+        for binary_views in (False, True):
+            with self.subTest(binary_views=binary_views):
+                cursor = self.execute(operation)
+                cursor.intern_strings = True
+                cursor.binary_views = binary_views
+                rows = list(iter(cursor.fetchone, None))
+                self.assertEqual(rows, expected)
+                values = [row[1] for row in rows if row[1] is not None]
+                self.assertEqual(
+                    len(set(map(id, values))),
+                    len(set(values))
+                )
+
+    def test_transactions(self):
+        connection = self.connect()
+        connection._begin_transaction()
+        self.assertTrue(connection._in_transaction())
+        connection.commit()
+        self.assertFalse(connection._in_transaction())
+
+
+class TestBatches(FakeAceMixin, unittest.TestCase):
+    '''
+    The rows fetched in batches by the native loop are the same fetched
+    one at a time, across the batch boundaries and with NULL values.
+    '''
+
+    sizes = (0, 1, adsdb3._BATCH_SIZE, adsdb3._BATCH_SIZE + 1, 2500)
+
+    def one_at_a_time(self, operation):
+        cursor = self.execute(operation)
+        return list(iter(cursor.fetchone, None))
+
+    def test_fetchall(self):
+        for n in self.sizes:
+            with self.subTest(rows=n):
+                operation = select(n)
+                rows = self.one_at_a_time(operation)
+                self.assertEqual(len(rows), n)
+                self.assertEqual(self.execute(operation).fetchall(), rows)
+
+    def test_fetchmany(self):
+        operation = select(2500)
+        rows = self.one_at_a_time(operation)
+        cursor = self.execute(operation)
+        fetched = []
+        while True:
+            many = cursor.fetchmany(1000)
+            if not many:
+                break
+            fetched.extend(many)
+        self.assertEqual(fetched, rows)
+
+    def test_iteration(self):
+        operation = select(2500)
+        rows = self.one_at_a_time(operation)
+        cursor = self.execute(operation)
+        cursor.warn_extensions = False
+        first = next(cursor)
+        self.assertEqual([first] + cursor.fetchmany(10) + list(cursor), rows)
+        self.assertEqual(cursor.fetchall(), [])
+
+    def test_columns_after_iteration(self):
+        cursor = self.execute(select(10))
+        cursor.warn_extensions = False
+        next(cursor)
+        self.assertRaises(adsdb3.InterfaceError, cursor.fetch_columns)
+
+    def test_fetch_columns(self):
+        operation = select(2500)
+        rows = self.one_at_a_time(operation)
+        columns, nulls = self.execute(operation).fetch_columns()
+        for column, mask, values in zip(columns, nulls, zip(*rows)):
+            self.assertEqual(len(column), len(values))
+            for value, null, expected in zip(column, mask, values):
+                self.assertEqual(bool(null), expected is None)
+                if expected is not None:
+                    self.assertEqual(value, expected)
+
+    def test_lazy_rows(self):
+        operation = select(2500)
+        rows = self.one_at_a_time(operation)
+        cursor = self.execute(operation)
+        cursor.lazy_rows = True
+        self.assertEqual(cursor.fetchall(), rows)
+
+    def test_projection(self):
+        operation = select(2500)
+        rows = self.one_at_a_time(operation)
+        cursor = self.execute(operation)
+        cursor.set_projection(['col13', 2])
+        self.assertEqual(
+            cursor.fetchall(),
+            [(row[12], row[2]) for row in rows]
+        )
+
+    def test_empty_projection(self):
+        cursor = self.execute(select(10))
+        self.assertRaises(adsdb3.ProgrammingError, cursor.set_projection, [])
+        self.assertEqual(len(cursor.description), 19)
+        self.assertEqual(len(cursor.fetchall()), 10)
+
+
+class TestExport(FakeAceMixin, unittest.TestCase):
+
+    def test_lock_released_between_batches(self):
+        cursor = self.execute(select(2500))
+        free = []
+
+        def try_lock():
+            if cursor._lock.acquire(blocking=False):
+                cursor._lock.release()
+                free.append(True)
+            else:
+                free.append(False)
+
+        class Output(io.StringIO):
+            def write(self, s):
+                thread = threading.Thread(target=try_lock)
+                thread.start()
+                thread.join()
+                return super().write(s)
+
+        output = Output()
+        self.assertEqual(cursor.export_jsonl(output), 2500)
+        self.assertEqual(len(output.getvalue().splitlines()), 2500)
+        # one write for every batch
+        self.assertEqual(free, [True] * 3)
+
+    def test_used_during_export(self):
+        # the same SQL gets the same statement from the cache
+        for operation in (select(1), select(2500)):
+            with self.subTest(operation=operation):
+                cursor = self.execute(select(2500))
+                executed = []
+
+                class Output(io.StringIO):
+                    def write(self, s):
+                        if not executed:
+                            cursor.execute(operation)
+                            executed.append(operation)
+                        return super().write(s)
+
+                self.assertRaises(
+                    adsdb3.InterfaceError,
+                    cursor.export_jsonl,
+                    Output()
+                )
+
+
+class TestNumpyBatches(FakeAceMixin, unittest.TestCase):
+
+    @unittest.skipIf(adsdb3.numpy is None, 'numpy is not installed')
+    def test_cursor_executed_again(self):
+        cursor = self.execute(select(30, 'integer'))
+        batches = cursor.fetch_numpy_batches(10)
+        self.assertEqual(len(next(batches)['col1']), 10)
+        cursor.execute(select(30, 'varchar(20)'))
+        self.assertRaises(adsdb3.InterfaceError, next, batches)
+        self.assertEqual(len(cursor.fetchall()), 30)
+
+
+@unittest.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+class TestArrowExport(FakeAceMixin, unittest.TestCase):
+
+    operation = select(2500, 'integer,char(4),varchar(20)')
+
+    def test_dictionary_batches(self):
+        rows = self.execute(self.operation).fetchall()
+        cursor = self.execute(self.operation)
+        fileobj = io.BytesIO()
+        stats = export.to_arrow_ipc(cursor, fileobj, batch_size=1000,
+                                    dictionary_encode=True)
+        self.assertEqual(stats.batches, 3)
+        self.assertEqual(stats.columns[1].encodings, ('DICTIONARY', ))
+        fileobj.seek(0)
+        table = export.pyarrow.ipc.open_file(fileobj).read_all()
+        self.assertTrue(
+            export.pyarrow.types.is_dictionary(table.schema.field(1).type)
+        )
+        self.assertEqual(
+            [tuple(row.values()) for row in table.to_pylist()],
+            rows
+        )
+
+    def test_cursor_executed_again(self):
+        connection = self.connect()
+        operation = select(30, 'integer')
+        a = self.execute(operation, connection=connection)
+        batches = a.fetch_arrow_batches(10)
+        self.assertEqual(next(batches).num_rows, 10)
+        a.execute(select(1))
+        # b gets the statement a was using from the cache
+        b = self.execute(operation, connection=connection)
+        self.assertRaises(adsdb3.InterfaceError, next, batches)
+        self.assertEqual(len(b.fetchall()), 30)
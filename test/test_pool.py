@@ -0,0 +1,263 @@
+# Copyright (c) 2018 Marco Giusti
+
+import functools
+import threading
+import unittest
+
+import adsdb3
+from adsdb3.pool import Pool, PoolTimeout
+from adsdb3_test_utils import ConnectMixin
+
+
+class _DummyConnection:
+
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+        self.broken = False
+
+    def rollback(self):
+        if self.broken or self.closed:
+            raise adsdb3.OperationalError('broken connection')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def _check(connection):
+    if connection.broken:
+        raise adsdb3.OperationalError('broken connection')
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPool(unittest.TestCase):
+
+    def new_pool(self, **kwds):
+        self.connections = []
+        kwds.setdefault('minsize', 0)
+        kwds.setdefault('check', _check)
+        pool = Pool(self._connect, **kwds)
+        self.addCleanup(pool.close)
+        return pool
+
+    def _connect(self):
+        connection = _DummyConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_reuse(self):
+        pool = self.new_pool()
+        with pool.connection() as connection:
+            pass
+        with pool.connection() as connection2:
+            self.assertIs(connection, connection2)
+        self.assertEqual(len(self.connections), 1)
+
+    def test_rollback_on_release(self):
+        pool = self.new_pool()
+        with pool.connection() as connection:
+            pass
+        self.assertEqual(connection.rollbacks, 1)
+
+    def test_release_unknown_connection(self):
+        pool = self.new_pool()
+        self.assertRaises(
+            adsdb3.InterfaceError,
+            pool.release,
+            _DummyConnection()
+        )
+
+    def test_broken_connection_is_discarded(self):
+        pool = self.new_pool()
+        with pool.connection() as connection:
+            connection.broken = True
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats().size, 0)
+
+    def test_health_check(self):
+        pool = self.new_pool()
+        with pool.connection() as connection:
+            pass
+        connection.broken = True
+        with pool.connection() as connection2:
+            self.assertIsNot(connection, connection2)
+        self.assertTrue(connection.closed)
+
+    def test_check_unexpected_error(self):
+        def check(connection):
+            raise RuntimeError('unexpected')
+
+        pool = self.new_pool()
+        with pool.connection():
+            pass
+        pool.check = check
+        self.assertRaises(RuntimeError, pool.acquire)
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(pool.stats().size, 0)
+
+    def test_maxsize(self):
+        pool = self.new_pool(maxsize=2)
+        pool.acquire()
+        pool.acquire()
+        self.assertRaises(PoolTimeout, pool.acquire, 0.01)
+        stats = pool.stats()
+        self.assertEqual(stats.in_use, 2)
+        self.assertEqual(stats.timeouts, 1)
+
+    def test_wait_for_release(self):
+        pool = self.new_pool(maxsize=1)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, (connection, ))
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertIs(pool.acquire(5), connection)
+        stats = pool.stats()
+        self.assertEqual(stats.checkouts, 2)
+        self.assertEqual(stats.waits, 1)
+        self.assertGreater(stats.max_wait, 0)
+
+    def test_max_lifetime(self):
+        pool = self.new_pool(max_lifetime=10)
+        pool.clock = clock = _Clock()
+        connection = pool.acquire()
+        clock.now = 10
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        with pool.connection() as connection2:
+            self.assertIsNot(connection, connection2)
+
+    def test_prefill(self):
+        pool = self.new_pool(minsize=2)
+        with pool._cond:
+            pool._cond.wait_for(lambda: len(pool._idle) == 2, 5)
+        self.assertEqual(pool.stats().idle, 2)
+
+    def test_prefill_unexpected_error(self):
+        failures = [OSError('unexpected')]
+
+        def connect():
+            if failures:
+                raise failures.pop()
+            return self._connect()
+
+        self.connections = []
+        pool = Pool(connect, minsize=3, maxsize=3, check=_check)
+        self.addCleanup(pool.close)
+        with pool._cond:
+            pool._cond.wait_for(lambda: len(pool._idle) == 3, 5)
+        self.assertTrue(pool._maintainer.is_alive())
+        stats = pool.stats()
+        self.assertEqual((stats.size, stats.idle), (3, 3))
+        connections = [pool.acquire(0.01) for i in range(3)]
+        self.assertEqual(len(set(map(id, connections))), 3)
+
+    def test_close(self):
+        pool = self.new_pool()
+        connection = pool.acquire()
+        with pool.connection() as connection2:
+            pass
+        pool.close()
+        self.assertTrue(connection2.closed)
+        self.assertFalse(connection.closed)
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertRaises(adsdb3.InterfaceError, pool.acquire)
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError, Pool, self._connect, 2, 1)
+
+
+class _BrokenPool:
+
+    def acquire(self):
+        raise RuntimeError('broken pool')
+
+    def release(self, connection):
+        pass
+
+
+class TestGatherErrors(unittest.TestCase):
+
+    def test_unexpected_error(self):
+        results = adsdb3.gather(_BrokenPool(), ['SELECT 1', 'SELECT 2'])
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertIsInstance(result.error, RuntimeError)
+            self.assertIsNone(result.rows)
+
+
+class TestPoolConnect(ConnectMixin, unittest.TestCase):
+
+    def test_connection(self):
+        connect = functools.partial(
+            adsdb3.connect,
+            *self.connect_args,
+            **self.connect_kw_args
+        )
+        with Pool(connect, minsize=0, check=None) as pool:
+            with pool.connection() as connection:
+                self.assertIsInstance(connection, adsdb3.Connection)
+            self.assertEqual(pool.stats().idle, 1)
+
+
+class TestGather(ConnectMixin, unittest.TestCase):
+
+    query = 'EXECUTE PROCEDURE sp_mgGetInstallInfo()'
+
+    def setUp(self):
+        super().setUp()
+        self.connect = functools.partial(
+            adsdb3.connect,
+            *self.connect_args,
+            **self.connect_kw_args
+        )
+        connection = self.connect()
+        self.addCleanup(connection.close)
+        cursor = connection.cursor()
+        cursor.execute(self.query)
+        self.expected = cursor.fetchall()
+        cursor.close()
+
+    def test_connect(self):
+        results = adsdb3.gather(self.connect, [self.query] * 4, 2)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.rows, self.expected)
+            self.assertGreaterEqual(result.elapsed, 0)
+
+    def test_pool(self):
+        with Pool(self.connect, minsize=0, maxsize=2) as pool:
+            results = adsdb3.gather(pool, [(self.query, ())] * 3)
+            self.assertEqual(pool.stats().checkouts, 3)
+        self.assertEqual([r.rows for r in results], [self.expected] * 3)
+
+    def test_error(self):
+        results = adsdb3.gather(
+            self.connect,
+            [self.query, 'SELECT syntax error FROM', self.query]
+        )
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, adsdb3.DatabaseError)
+        self.assertIsNone(results[1].rows)
+        self.assertEqual(results[2].rows, self.expected)
+
+    def test_invalid_parameters(self):
+        results = adsdb3.gather(
+            self.connect,
+            [(self.query, None), self.query]
+        )
+        self.assertIsInstance(results[0].error, TypeError)
+        self.assertEqual(results[1].rows, self.expected)
+
+    def test_empty(self):
+        self.assertEqual(adsdb3.gather(self.connect, []), [])